@@ -16,6 +16,18 @@ class Settings(BaseSettings):
     GOOGLE_REDIRECT_URI: Optional[str] = "http://localhost:8000/auth/google/callback"
     CHAIN_RPC_URL: Optional[str] = None
     ECO_TOKEN_ADDRESS: Optional[str] = None
+    CHAIN_RPC_POOL_SIZE: int = 10
+    CHAIN_RPC_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    CHAIN_RPC_TIMEOUT_SECONDS: float = 10.0
+    CHAIN_RECEIPT_POLL_SECONDS: float = 5.0
+    CHAIN_PENDING_TIMEOUT_SECONDS: float = 900.0
+    CHAIN_BALANCE_CACHE_TTL_SECONDS: float = 30.0
+    CHAIN_BALANCE_CACHE_MAX_ENTRIES: int = 10000
+    CHAIN_MULTICALL_ADDRESS: Optional[str] = "0xcA11bde05977b3631167028862bE2a173976CA11" # Multicall3; unset to use JSON-RPC batches
+    MINT_BATCH_SIZE: int = 100
+    MINT_BATCH_WINDOW_SECONDS: float = 10.0
+    MINT_SENDING_TIMEOUT_SECONDS: float = 300.0
+    MINT_MAX_ATTEMPTS: int = 3
     ECO_TOKEN_OWNER_PRIVATE_KEY: Optional[str] = None
     ECO_TOKEN_CONVERSION_RATE: float = 1.0
     ECO_TOKEN_AUTO_THRESHOLD: int = 100
@@ -23,8 +35,19 @@ class Settings(BaseSettings):
     CARBON_CREDIT_KG_PER_CREDIT: float = 1000.0
     CARBON_CREDIT_TOKEN_ADDRESS: Optional[str] = None
     CARBON_CREDIT_OWNER_PRIVATE_KEY: Optional[str] = None
+    CARBON_CREDIT_RECOMPUTE_CHUNK_SIZE: int = 10000
     GEMINI_API_KEY: Optional[str] = None
     GEMINI_MODEL: str = "gemini-1.5-flash"
+    BULK_INGEST_MAX_ITEMS: int = 5000
+    EMISSION_FACTOR_CACHE_TTL_SECONDS: int = 300
+    DASHBOARD_CACHE_TTL_SECONDS: int = 30
+    DASHBOARD_CACHE_MAX_ENTRIES: int = 10000
+    LEADERBOARD_RELOAD_SECONDS: int = 300
+    CHALLENGE_CACHE_TTL_SECONDS: int = 60
+    BADGE_CATALOG_TTL_SECONDS: int = 300
+    CARBON_CUBE_FOLD_SECONDS: float = 30.0
+    ANALYTICS_EXPORT_DIR: str = "exports/parquet"
+    ANALYTICS_EXPORT_BATCH_SIZE: int = 50000
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
@@ -20,9 +22,95 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_pool_lock = threading.Lock()
+_pool_metrics = {
+    "checkouts": 0,
+    "in_use": 0,
+    "peak_in_use": 0,
+    "saturated_checkouts": 0, # Checkouts that left no connection free
+    "hold_ms_total": 0.0,
+    "hold_ms_max": 0.0,
+}
+
+
+def _pool_capacity() -> int:
+    return settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, record, proxy):
+    record.info["checked_out_at"] = time.perf_counter()
+    with _pool_lock:
+        m = _pool_metrics
+        m["checkouts"] += 1
+        m["in_use"] += 1
+        m["peak_in_use"] = max(m["peak_in_use"], m["in_use"])
+        if m["in_use"] >= _pool_capacity():
+            m["saturated_checkouts"] += 1
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, record):
+    started = record.info.pop("checked_out_at", None)
+    if started is None:
+        return
+    held = (time.perf_counter() - started) * 1000
+    with _pool_lock:
+        m = _pool_metrics
+        m["in_use"] -= 1
+        m["hold_ms_total"] += held
+        m["hold_ms_max"] = max(m["hold_ms_max"], held)
+
+
+def pool_stats() -> dict:
+    """
+    Connection pool usage since start: how close the pool came to running
+    out and how long requests held a connection.
+    """
+    with _pool_lock:
+        m = dict(_pool_metrics)
+    capacity = _pool_capacity()
+    checkouts = m["checkouts"] or 1
+    return {
+        "capacity": capacity,
+        "in_use": m["in_use"],
+        "peak_in_use": m["peak_in_use"],
+        "utilization": round(m["in_use"] / capacity, 3) if capacity else None,
+        "checkouts": m["checkouts"],
+        "saturated_checkouts": m["saturated_checkouts"],
+        "avg_hold_ms": round(m["hold_ms_total"] / checkouts, 3),
+        "max_hold_ms": round(m["hold_ms_max"], 3),
+    }
+
+
+def release_connection(db):
+    """
+    Commits the session's work and returns its connection to the pool, so a
+    request can wait on chain or HTTP I/O without holding one. Objects
+    already loaded stay readable; record outcomes on a new short session.
+    """
+    expire = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire
+    db.close()
+
 
 Base = declarative_base()
 
+def dialect_insert(db, model):
+    """
+    Returns an INSERT construct for the bound dialect so callers can use
+    on_conflict_do_nothing / on_conflict_do_update.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -3,14 +3,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from .database import engine, Base, get_db, SessionLocal
-from . import models, schemas, dependencies
-from .routers import auth, payments, transactions, emissions, carbon, eco_points, achievements, gamification, dashboard, wallet, blockchain, tokens, carbon_credits, companies, marketplace, admin, wallets, merchant_orders
-from .services import badges, challenges, marketplace_service
+from .pagination import NEXT_CURSOR_HEADER
+from . import models, schemas, dependencies, schema_upgrades
+from .routers import auth, payments, transactions, emissions, carbon, eco_points, achievements, gamification, dashboard, wallet, blockchain, tokens, carbon_credits, companies, marketplace, admin, wallets, merchant_orders, export
+from .services import badges, challenges, marketplace_service, receipt_tracker, mint_batcher, carbon_cube
 from .services import logging_service
 from fastapi.responses import JSONResponse
 
 # Create the database tables
 models.Base.metadata.create_all(bind=engine)
+schema_upgrades.upgrade(engine)
 
 app = FastAPI(title="GreenZaction API")
 
@@ -25,6 +27,15 @@ def startup_event():
         marketplace_service.seed_demo_listings(db)
     finally:
         db.close()
+    mint_batcher.start()
+    receipt_tracker.start()
+    carbon_cube.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    mint_batcher.stop()
+    receipt_tracker.stop()
+    carbon_cube.stop()
 
 app.include_router(auth.router)
 app.include_router(payments.router)
@@ -45,6 +56,7 @@ app.include_router(carbon_credits.router)
 app.include_router(companies.router)
 app.include_router(marketplace.router)
 app.include_router(admin.router)
+app.include_router(export.router)
 
 @app.exception_handler(Exception)
 async def _log_exception(request: Request, exc: Exception):
@@ -63,6 +75,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Content-Disposition"],
 )
 
 @app.get("/health")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Date, Float, Text, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -49,6 +49,10 @@ class Payment(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_user_created", "user_id", "created_at", "id"),
+        Index("ix_transactions_user_type_status", "user_id", "type", "status", "amount"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -79,6 +83,9 @@ class EmissionFactor(Base):
 
 class CarbonRecord(Base):
     __tablename__ = "carbon_records"
+    __table_args__ = (
+        Index("ix_carbon_records_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -95,6 +102,10 @@ class CarbonRecord(Base):
 
 class CarbonSaving(Base):
     __tablename__ = "carbon_savings"
+    __table_args__ = (
+        Index("ix_carbon_savings_user_created", "user_id", "created_at", "id"),
+        Index("ix_carbon_savings_record", "carbon_record_id", "saved_amount"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -107,13 +118,94 @@ class CarbonSaving(Base):
     user = relationship("User", back_populates="carbon_savings")
     carbon_record = relationship("CarbonRecord", back_populates="carbon_saving")
 
+class CarbonRollup(Base):
+    __tablename__ = "carbon_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "period_type", "period_start", "category", name="uq_carbon_rollup_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    period_type = Column(String) # day, month
+    period_start = Column(Date) # UTC day / first of the month
+    category = Column(String)
+    emitted_kg = Column(Float, default=0.0)
+    saved_kg = Column(Float, default=0.0)
+    spent = Column(Integer, default=0) # Paisa, summed from carbon record amounts
+    record_count = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CarbonCube(Base):
+    __tablename__ = "carbon_cube"
+    __table_args__ = (
+        UniqueConstraint("day", "category", name="uq_carbon_cube_cell"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date) # UTC
+    category = Column(String)
+    emitted_kg = Column(Float, default=0.0)
+    saved_kg = Column(Float, default=0.0)
+    spent = Column(Integer, default=0) # Paisa
+    record_count = Column(Integer, default=0)
+    users_sketch = Column(LargeBinary, nullable=True) # HyperLogLog registers for distinct users
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CarbonCubeDelta(Base):
+    """
+    Append-only cube contributions from the write path, folded into
+    CarbonCube in the background.
+    """
+    __tablename__ = "carbon_cube_deltas"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date) # UTC
+    category = Column(String)
+    user_id = Column(Integer)
+    emitted_kg = Column(Float, default=0.0)
+    saved_kg = Column(Float, default=0.0)
+    spent = Column(Integer, default=0) # Paisa
+    record_count = Column(Integer, default=0)
+
+class UserCarbonTotals(Base):
+    __tablename__ = "user_carbon_totals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
+    saved_kg = Column(Float, default=0.0) # Running SUM(carbon_savings.saved_amount)
+    emitted_kg = Column(Float, default=0.0) # Running SUM(carbon_records.carbon_emission)
+    transaction_count = Column(Integer, default=0)
+    spent = Column(Integer, default=0) # Running SUM of completed debit amounts, paisa
+    first_activity_at = Column(DateTime(timezone=True), nullable=True) # First carbon record
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class UserRewardState(Base):
+    __tablename__ = "user_reward_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
+    last_daily_bonus_on = Column(Date, nullable=True) # UTC day of the last daily bonus
+    milestones_paid = Column(Integer, default=0) # Bit i set once reward_rules.MILESTONES[i] was paid
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class UserDashboardSnapshot(Base):
+    __tablename__ = "user_dashboard_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
+    version = Column(Integer, default=0) # Bumped by every write that affects the dashboard
+    built_version = Column(Integer, nullable=True) # Version the payload was built from
+    period = Column(String, nullable=True) # YYYY-MM the monthly figures belong to
+    payload = Column(Text, nullable=True) # JSON
+    built_at = Column(DateTime(timezone=True), nullable=True)
+
 class EcoPointsBalance(Base):
     __tablename__ = "eco_points_balance"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
-    total_points = Column(Integer, default=0)
-    lifetime_points = Column(Integer, default=0)
+    total_points = Column(Integer, default=0, index=True)
+    lifetime_points = Column(Integer, default=0, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -121,6 +213,10 @@ class EcoPointsBalance(Base):
 
 class EcoPointsTransaction(Base):
     __tablename__ = "eco_points_transactions"
+    __table_args__ = (
+        Index("ix_eco_points_transactions_user_created", "user_id", "created_at", "id"),
+        Index("ix_eco_points_transactions_user_action", "user_id", "action_type", "description", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -133,6 +229,20 @@ class EcoPointsTransaction(Base):
     user = relationship("User", back_populates="eco_points_transactions")
     transaction = relationship("Transaction", back_populates="eco_points_transaction")
 
+class EcoPointsPeriodBucket(Base):
+    __tablename__ = "eco_points_period_buckets"
+    __table_args__ = (
+        UniqueConstraint("period_type", "period_start", "user_id", name="uq_points_bucket_period_user"),
+        Index("ix_points_bucket_period_points", "period_type", "period_start", "points"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    period_type = Column(String) # week, month
+    period_start = Column(Date) # Monday of the ISO week / first of the month (UTC)
+    points = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class EcoScore(Base):
     __tablename__ = "eco_scores"
 
@@ -205,13 +315,20 @@ class SystemLog(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 class EcoTokenConversion(Base):
     __tablename__ = "eco_token_conversions"
+    __table_args__ = (
+        Index("ix_eco_token_conversions_user_created", "user_id", "created_at", "id"),
+        Index("ix_eco_token_conversions_status", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True)
     points = Column(Integer)
     token_amount = Column(Float)
-    tx_hash = Column(String, index=True)
-    status = Column(String, default="minted")
+    tx_hash = Column(String, index=True) # Set when the mint batch is sent
+    wallet_address = Column(String, nullable=True) # Recipient of the queued mint
+    status = Column(String, default="queued") # queued, sending, pending, confirmed, failed (legacy rows: minted)
+    tx_nonce = Column(Integer, nullable=True) # Owner nonce of the signed mint batch
+    sent_at = Column(DateTime(timezone=True), nullable=True) # When the batch claimed the row
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User")
@@ -223,9 +340,14 @@ class Badge(Base):
     code = Column(String, unique=True, index=True)
     name = Column(String)
     description = Column(String, nullable=True)
+    metric = Column(String, nullable=True) # transactions, low_carbon_transactions, saved_kg, points
+    threshold = Column(Float, nullable=True) # Awarded once the metric reaches this value
 
 class UserBadge(Base):
     __tablename__ = "user_badges"
+    __table_args__ = (
+        UniqueConstraint("user_id", "badge_id", name="uq_user_badges_user_badge"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True)
@@ -256,9 +378,14 @@ class Challenge(Base):
     goal_value = Column(Float)
     reward_points = Column(Integer, default=0)
     active = Column(Boolean, default=True)
+    starts_at = Column(DateTime(timezone=True), nullable=True) # Open-ended when null
+    ends_at = Column(DateTime(timezone=True), nullable=True)
 
 class UserChallengeProgress(Base):
     __tablename__ = "user_challenge_progress"
+    __table_args__ = (
+        UniqueConstraint("user_id", "challenge_id", name="uq_challenge_progress_user_challenge"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True)
@@ -284,6 +411,9 @@ class CarbonCreditHolding(Base):
 
 class CarbonCreditListing(Base):
     __tablename__ = "carbon_credit_listings"
+    __table_args__ = (
+        Index("ix_carbon_credit_listings_status_created", "status", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     credit_id = Column(Integer, ForeignKey("carbon_savings.id"))
@@ -311,9 +441,16 @@ class MarketplaceOrder(Base):
     status = Column(String, default="PENDING")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     tx_hash = Column(String, nullable=True)
+    tx_status = Column(String, nullable=True, index=True) # queued, sending, pending, confirmed, failed once paid
+    tx_nonce = Column(Integer, nullable=True) # Owner nonce of the signed mint batch
+    sent_at = Column(DateTime(timezone=True), nullable=True) # When the batch claimed the row
+    mint_attempts = Column(Integer, default=0) # Failed mints so far; re-minted until MINT_MAX_ATTEMPTS
 
 class MarketplaceTransaction(Base):
     __tablename__ = "marketplace_transactions"
+    __table_args__ = (
+        Index("ix_marketplace_transactions_created", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     buyer_company_id = Column(Integer, ForeignKey("companies.id"), index=True)
@@ -321,6 +458,7 @@ class MarketplaceTransaction(Base):
     credit_amount = Column(Float)
     total_price = Column(Float)
     blockchain_tx_hash = Column(String, index=True)
+    order_id = Column(Integer, ForeignKey("marketplace_orders.id"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class UpiAccount(Base):
@@ -386,3 +524,13 @@ class MerchantOrder(Base):
     status = Column(String, default="PENDING")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     paid_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class AnalyticsExportCheckpoint(Base):
+    __tablename__ = "analytics_export_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String, unique=True, index=True)
+    last_id = Column(Integer, default=0) # Highest primary key already written to Parquet
+    exported_rows = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
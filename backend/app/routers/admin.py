@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
+from typing import Optional
+from datetime import date, datetime, timedelta, timezone
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_db, pool_stats, release_connection
+from ..pagination import MAX_LIMIT, paginate
 from ..config import settings
-from ..services import admin_auth_service
+from ..services import admin_auth_service, emission_factors, response_cache, carbon_cube, parquet_export, balance_cache, blockchain, carbon_credit_service
+from ..services import carbon_credit_blockchain_service as cc_chain
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -37,9 +41,17 @@ def admin_me(token: str, db: Session = Depends(get_db)):
     return rec
 
 @router.get("/users")
-def list_users(token: str, db: Session = Depends(get_db), skip: int = 0, limit: int = 50):
+def list_users(
+    token: str,
+    response: Response,
+    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None
+):
     _ = get_current_admin(token, db)
-    rows = db.query(models.User).order_by(models.User.id.asc()).offset(skip).limit(limit).all()
+    # Users have no created_at; id is their creation order, newest first like the other lists
+    rows = paginate(db.query(models.User), (models.User.id,), response, limit, cursor, skip)
     return [{"id": u.id, "email": u.email, "full_name": u.full_name, "is_active": u.is_active} for u in rows]
 
 @router.post("/users/{user_id}/suspend")
@@ -79,12 +91,18 @@ def reject_listing(listing_id: int, token: str, db: Session = Depends(get_db)):
     return {"id": l.id, "status": l.status}
 
 @router.get("/listings/pending")
-def pending_listings(token: str, db: Session = Depends(get_db), skip: int = 0, limit: int = 50):
+def pending_listings(
+    token: str,
+    response: Response,
+    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None
+):
     _ = get_current_admin(token, db)
-    rows = db.query(models.CarbonCreditListing)\
-        .filter(models.CarbonCreditListing.status == "PENDING")\
-        .order_by(models.CarbonCreditListing.created_at.desc())\
-        .offset(skip).limit(limit).all()
+    query = db.query(models.CarbonCreditListing)\
+        .filter(models.CarbonCreditListing.status == "PENDING")
+    rows = paginate(query, (models.CarbonCreditListing.created_at, models.CarbonCreditListing.id), response, limit, cursor, skip)
     return [
         {
             "id": r.id,
@@ -96,3 +114,142 @@ def pending_listings(token: str, db: Session = Depends(get_db), skip: int = 0, l
             "created_at": r.created_at
         } for r in rows
     ]
+
+@router.put("/emission-factors", response_model=schemas.EmissionFactorResponse)
+def upsert_emission_factor(data: schemas.EmissionFactorCreate, token: str, db: Session = Depends(get_db)):
+    _ = get_current_admin(token, db)
+    factor = db.query(models.EmissionFactor).filter(models.EmissionFactor.category == data.category).first()
+    if not factor:
+        factor = models.EmissionFactor(category=data.category)
+    factor.co2_per_unit = data.co2_per_unit
+    factor.baseline_co2_per_unit = data.baseline_co2_per_unit
+    factor.unit = data.unit
+    factor.description = data.description
+    db.add(factor)
+    db.commit()
+    db.refresh(factor)
+    emission_factors.refresh(db)
+    return factor
+
+@router.get("/cache-stats")
+def cache_stats(token: str, db: Session = Depends(get_db)):
+    _ = get_current_admin(token, db)
+    return {**response_cache.stats(), "chain_balances": balance_cache.stats()}
+
+@router.get("/db-pool")
+def db_pool_stats(token: str, db: Session = Depends(get_db)):
+    _ = get_current_admin(token, db)
+    return pool_stats()
+
+@router.get("/wallets")
+def list_wallets(
+    token: str,
+    response: Response,
+    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None
+):
+    _ = get_current_admin(token, db)
+    query = db.query(models.UserWallet).filter(models.UserWallet.address.isnot(None))
+    rows = paginate(query, (models.UserWallet.id,), response, limit, cursor, skip, descending=False)
+    addresses = [w.address for w in rows]
+    release_connection(db)
+    eco, cct = {}, {}
+    if addresses:
+        try:
+            eco = blockchain.get_balances(addresses) if settings.ECO_TOKEN_ADDRESS else {}
+            cct = cc_chain.get_credit_balances(addresses)
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Chain error: {str(e)}")
+    return [
+        {
+            "user_id": w.user_id,
+            "address": w.address,
+            "eco_tokens": None if eco.get(w.address.lower()) is None else eco[w.address.lower()] / (10**18),
+            "carbon_credit_tokens": None if cct.get(w.address.lower()) is None else float(cct[w.address.lower()]),
+        } for w in rows
+    ]
+
+@router.get("/carbon-credits/deltas")
+def carbon_credit_deltas(
+    token: str,
+    response: Response,
+    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(200, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None
+):
+    _ = get_current_admin(token, db)
+    query = db.query(models.UserWallet).filter(models.UserWallet.address.isnot(None))
+    rows = paginate(query, (models.UserWallet.id,), response, limit, cursor, skip, descending=False)
+    expected = carbon_credit_service.expected_credits(db, [w.user_id for w in rows])
+    release_connection(db)
+    try:
+        return carbon_credit_service.onchain_deltas(expected)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Chain error: {str(e)}")
+
+@router.post("/carbon-credits/recalculate")
+def recalculate_carbon_credits(token: str, db: Session = Depends(get_db), chunk_size: Optional[int] = None):
+    _ = get_current_admin(token, db)
+    if chunk_size is not None and chunk_size <= 0:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+    return carbon_credit_service.recalculate_all_holdings(db, chunk_size)
+
+@router.get("/analytics/carbon")
+def carbon_analytics(
+    token: str,
+    db: Session = Depends(get_db),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: Optional[str] = None,
+    group_by: str = "day"
+):
+    _ = get_current_admin(token, db)
+    if group_by not in ("day", "category", "total"):
+        raise HTTPException(status_code=400, detail="group_by must be day, category or total")
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return {
+        "start": start,
+        "end": end,
+        "group_by": group_by,
+        "rows": carbon_cube.query(db, start, end, category=category, group_by=group_by)
+    }
+
+@router.post("/analytics/carbon/rebuild")
+def rebuild_carbon_analytics(
+    token: str,
+    db: Session = Depends(get_db),
+    start: Optional[date] = None,
+    end: Optional[date] = None
+):
+    _ = get_current_admin(token, db)
+    cells = carbon_cube.rebuild(db, start, end)
+    db.commit()
+    return {"cells": cells}
+
+@router.post("/exports/parquet", status_code=202)
+def start_parquet_export(
+    token: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    tables: Optional[str] = None
+):
+    _ = get_current_admin(token, db)
+    names = [t.strip() for t in tables.split(",") if t.strip()] if tables else list(parquet_export.TABLES)
+    unknown = [t for t in names if t not in parquet_export.TABLES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(unknown)}")
+    if parquet_export.status()["running"]:
+        raise HTTPException(status_code=409, detail="An export is already running")
+    background_tasks.add_task(parquet_export.run, names)
+    return {"scheduled": names}
+
+@router.get("/exports/parquet")
+def parquet_export_status(token: str, db: Session = Depends(get_db)):
+    _ = get_current_admin(token, db)
+    return {**parquet_export.status(), "checkpoints": parquet_export.checkpoints(db)}
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from .. import models, dependencies
-from ..database import get_db
+from ..database import get_db, release_connection, SessionLocal
 from ..config import settings
-from ..services import blockchain
+from ..services import blockchain, logging_service
 from decimal import Decimal
 
 router = APIRouter(prefix="/blockchain", tags=["blockchain"])
@@ -12,8 +12,9 @@ router = APIRouter(prefix="/blockchain", tags=["blockchain"])
 def get_balance(address: str, current_user: models.User = Depends(dependencies.get_current_user), db: Session = Depends(get_db)):
     if not settings.CHAIN_RPC_URL or not settings.ECO_TOKEN_ADDRESS:
         raise HTTPException(status_code=500, detail="Chain not configured")
+    release_connection(db)
     try:
-        bal = blockchain.get_balance(address)
+        bal = blockchain.get_cached_balance(address)
         return {"address": address, "balance": str(Decimal(bal) / Decimal(10**18))}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -30,8 +31,12 @@ def mint(payload: dict, current_user: models.User = Depends(dependencies.get_cur
         amount_wei = int(Decimal(str(amount)) * Decimal(10**18))
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid amount")
+    release_connection(db)
     try:
         res = blockchain.mint(to, amount_wei)
-        return res
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    with SessionLocal() as log_db:
+        logging_service.log_event(log_db, "TOKEN_MINT", current_user.id, f"{to} {res['tx_hash']}")
+        log_db.commit()
+    return res
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List
-from datetime import datetime, date
+from typing import List, Optional
+from datetime import datetime, timezone
 from .. import models, schemas, dependencies
 from ..database import get_db
+from ..pagination import MAX_LIMIT, paginate
+from ..services import carbon_totals, carbon_rollups
 
 router = APIRouter(
     prefix="/carbon",
@@ -19,29 +20,16 @@ def get_carbon_summary(
     """
     Get the total carbon footprint, monthly carbon (current month), and daily average.
     """
-    # Total Carbon
-    total_carbon = db.query(func.sum(models.CarbonRecord.carbon_emission))\
-        .filter(models.CarbonRecord.user_id == current_user.id)\
-        .scalar() or 0.0
-
-    # Monthly Carbon (Current Month)
-    today = datetime.now()
-    # Extract year and month matching
-    monthly_carbon = db.query(func.sum(models.CarbonRecord.carbon_emission))\
-        .filter(
-            models.CarbonRecord.user_id == current_user.id,
-            func.extract('year', models.CarbonRecord.created_at) == today.year,
-            func.extract('month', models.CarbonRecord.created_at) == today.month
-        ).scalar() or 0.0
-
-    # Daily Average
-    # Find the date of the first transaction/record
-    first_record_date = db.query(func.min(models.CarbonRecord.created_at))\
-        .filter(models.CarbonRecord.user_id == current_user.id)\
-        .scalar()
+    today = datetime.now(timezone.utc)
+    totals = carbon_totals.get_totals(db, current_user.id)
+    total_carbon = totals.emitted_kg or 0.0
+    monthly_carbon = carbon_rollups.month_emission(db, current_user.id, today)
 
+    # Daily Average since the first record
+    first_record_date = totals.first_activity_at
     if first_record_date:
-        # Calculate days since first record
+        if first_record_date.tzinfo is None:
+            first_record_date = first_record_date.replace(tzinfo=timezone.utc)
         days_active = (today - first_record_date).days + 1 # +1 to avoid division by zero on day 1
         daily_average = total_carbon / days_active
     else:
@@ -55,22 +43,20 @@ def get_carbon_summary(
 
 @router.get("/history", response_model=List[schemas.CarbonRecordResponse])
 def get_carbon_history(
-    skip: int = 0,
-    limit: int = 20,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(dependencies.get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get the carbon footprint history (list of records).
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
     """
-    records = db.query(models.CarbonRecord)\
-        .filter(models.CarbonRecord.user_id == current_user.id)\
-        .order_by(models.CarbonRecord.created_at.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    
-    return records
+    query = db.query(models.CarbonRecord)\
+        .filter(models.CarbonRecord.user_id == current_user.id)
+    return paginate(query, (models.CarbonRecord.created_at, models.CarbonRecord.id), response, limit, cursor, skip)
 
 @router.get("/monthly", response_model=List[schemas.MonthlyCarbonBreakdown])
 def get_monthly_breakdown(
@@ -78,27 +64,9 @@ def get_monthly_breakdown(
     db: Session = Depends(get_db)
 ):
     """
-    Get the monthly breakdown of carbon emissions.
+    Get the monthly breakdown of carbon emissions, read from the monthly rollups.
     """
-    # Postgres specific: to_char
-    # If using SQLite for testing, this might fail. 
-    # But user requirements implied "Efficient SQL", so likely Postgres.
-    # To be safe for hybrid envs, we can check dialect or just use generic extract if simpler.
-    # But to_char is standard for formatting.
-    # Let's try to_char.
-    
-    results = db.query(
-        func.to_char(models.CarbonRecord.created_at, 'YYYY-MM').label('month'),
-        func.sum(models.CarbonRecord.carbon_emission).label('total_carbon')
-    ).filter(
-        models.CarbonRecord.user_id == current_user.id
-    ).group_by(
-        'month'
-    ).order_by(
-        desc('month')
-    ).all()
-    
     return [
-        {"month": row.month, "total_carbon": round(row.total_carbon, 2)}
-        for row in results
+        {"month": row["month"], "total_carbon": round(row["total_carbon"], 2)}
+        for row in carbon_rollups.monthly_breakdown(db, current_user.id)
     ]
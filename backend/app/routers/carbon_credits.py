@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List
+from typing import List, Optional
 from .. import models, schemas, dependencies
-from ..database import get_db
-from ..services import carbon_credit_service
+from ..database import get_db, release_connection
+from ..pagination import MAX_LIMIT, paginate
+from ..services import carbon_credit_service, carbon_totals
 from ..services import carbon_credit_blockchain_service as cc_chain
 
 router = APIRouter(prefix="/carbon-credits", tags=["carbon-credits"])
@@ -14,15 +15,14 @@ def get_balance(
     current_user: models.User = Depends(dependencies.get_current_user),
     db: Session = Depends(get_db)
 ):
-    total_saved = db.query(func.sum(models.CarbonSaving.saved_amount))\
-        .filter(models.CarbonSaving.user_id == current_user.id)\
-        .scalar() or 0.0
+    total_saved = carbon_totals.get_totals(db, current_user.id).saved_kg or 0.0
     holding = carbon_credit_service.generate_carbon_credits(db, current_user.id)
     wallet = db.query(models.UserWallet).filter(models.UserWallet.user_id == current_user.id).first()
     token_bal = 0.0
     if wallet and wallet.address:
+        release_connection(db)
         try:
-            token_bal = float(cc_chain.get_credit_balance(wallet.address))
+            token_bal = float(cc_chain.get_cached_credit_balance(wallet.address))
         except Exception:
             token_bal = 0.0
     return {
@@ -34,15 +34,16 @@ def get_balance(
 
 @router.get("/history", response_model=List[schemas.CarbonCreditHistoryItem])
 def get_history(
+    response: Response,
     current_user: models.User = Depends(dependencies.get_current_user),
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 50
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None
 ):
-    rows = db.query(models.CarbonSaving)\
-        .filter(models.CarbonSaving.user_id == current_user.id)\
-        .order_by(models.CarbonSaving.created_at.desc())\
-        .offset(skip).limit(limit).all()
+    query = db.query(models.CarbonSaving)\
+        .filter(models.CarbonSaving.user_id == current_user.id)
+    rows = paginate(query, (models.CarbonSaving.created_at, models.CarbonSaving.id), response, limit, cursor, skip)
     out: List[schemas.CarbonCreditHistoryItem] = []
     for r in rows:
         out.append({
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from .. import models, schemas, dependencies
 from ..database import get_db
+from ..pagination import MAX_LIMIT, paginate
 from ..config import settings
 from ..services import eco_points
 from ..services import logging_service
@@ -25,18 +26,16 @@ def get_balance(
 
 @router.get("/history", response_model=List[schemas.EcoPointsTransactionResponse])
 def get_history(
-    skip: int = 0,
-    limit: int = 20,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(dependencies.get_current_user),
     db: Session = Depends(get_db)
 ):
-    rows = db.query(models.EcoPointsTransaction)\
-        .filter(models.EcoPointsTransaction.user_id == current_user.id)\
-        .order_by(models.EcoPointsTransaction.created_at.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    return rows
+    query = db.query(models.EcoPointsTransaction)\
+        .filter(models.EcoPointsTransaction.user_id == current_user.id)
+    return paginate(query, (models.EcoPointsTransaction.created_at, models.EcoPointsTransaction.id), response, limit, cursor, skip)
 
 @router.get("/score", response_model=schemas.EcoScoreResponse)
 def get_score(
@@ -66,17 +65,19 @@ def convert_points(
             raise HTTPException(status_code=400, detail="Insufficient points")
         conv, res = result
     else:
-        converted = eco_points.auto_convert_threshold(db, current_user.id)
+        # Same locked sweep mint_batcher runs, scoped to this user; a balance
+        # a sweep already holds is converted there instead
+        converted = eco_points.auto_convert_due(db, 1, user_id=current_user.id)
         if not converted:
             db.commit()
-            return {"tx_hash": "", "points_converted": 0, "token_amount": 0.0}
+            return {"tx_hash": "", "points_converted": 0, "token_amount": 0.0, "status": None}
         total_points = sum(c.points for c in converted)
         total_tokens = sum(c.token_amount for c in converted)
         conv = converted[-1]
         res = {"tx_hash": conv.tx_hash}
     db.commit()
-    logging_service.log_event(db, "TOKEN_MINT", current_user.id, f"{res['tx_hash']}")
-    return {"tx_hash": res["tx_hash"], "points_converted": total_points if not points else conv.points, "token_amount": total_tokens if not points else conv.token_amount}
+    logging_service.log_event(db, "TOKEN_MINT", current_user.id, f"conversion {conv.id} {conv.status} {res['tx_hash'] or ''}")
+    return {"tx_hash": res["tx_hash"] or "", "points_converted": total_points if not points else conv.points, "token_amount": total_tokens if not points else conv.token_amount, "status": conv.status}
 
 @router.get("/convertible", response_model=schemas.ConvertiblePointsResponse)
 def get_convertible(
@@ -4,6 +4,7 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from .. import models, schemas, database
+from ..services import emission_factors
 
 router = APIRouter(
     prefix="/emissions",
@@ -15,14 +16,14 @@ def get_emission_factors(db: Session = Depends(database.get_db)):
     """
     Get all emission factors.
     """
-    return db.query(models.EmissionFactor).all()
+    return list(emission_factors.get_factors(db).values())
 
 @router.get("/factors/{category}", response_model=schemas.EmissionFactorResponse)
 def get_emission_factor_by_category(category: str, db: Session = Depends(database.get_db)):
     """
     Get emission factor by category.
     """
-    factor = db.query(models.EmissionFactor).filter(models.EmissionFactor.category == category).first()
+    factor = emission_factors.get_factors(db).get(category)
     if not factor:
         raise HTTPException(status_code=404, detail="Emission factor not found for this category")
     return factor
@@ -33,6 +34,7 @@ def seed_emission_factors(db: Session):
     """
     # Check if we already have data
     if db.query(models.EmissionFactor).count() > 0:
+        emission_factors.refresh(db)
         return
 
     # Path to the data file: backend/data/emission_factors.json
@@ -67,3 +69,4 @@ def seed_emission_factors(db: Session):
     except Exception as e:
         db.rollback()
         print(f"Error seeding emission factors: {e}")
+    emission_factors.refresh(db)
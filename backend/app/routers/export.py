@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timezone
+from .. import models, dependencies
+from ..services import activity_export
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+@router.get("/activity")
+def export_activity(
+    format: str = "csv",
+    current_user: models.User = Depends(dependencies.get_current_user)
+):
+    """
+    Streams the user's full transaction history joined with its carbon record,
+    carbon saving and eco point entries, as CSV or NDJSON.
+    """
+    media_type = activity_export.FORMATS.get(format)
+    if not media_type:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d")
+    return StreamingResponse(
+        activity_export.stream(current_user.id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="activity-{current_user.id}-{stamp}.{format}"'}
+    )
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from .. import models, schemas, dependencies
 from ..database import get_db
-from ..services import challenges
+from ..pagination import MAX_LIMIT
+from ..services import challenges, leaderboard, period_leaderboard
 
 router = APIRouter(prefix="/gamification", tags=["gamification"])
 
@@ -48,21 +49,19 @@ def get_challenges(
 @router.get("/leaderboard", response_model=List[schemas.LeaderboardEntryResponse])
 def get_leaderboard(
     db: Session = Depends(get_db),
-    limit: int = 10
+    limit: int = Query(10, ge=1, le=MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    period: Optional[str] = None
 ):
-    rows = db.query(models.EcoPointsBalance, models.User, models.EcoUserLevel)\
-        .join(models.User, models.User.id == models.EcoPointsBalance.user_id)\
-        .outerjoin(models.EcoUserLevel, models.EcoUserLevel.user_id == models.User.id)\
-        .order_by(models.EcoPointsBalance.lifetime_points.desc())\
-        .limit(limit)\
-        .all()
-    result = []
-    for bal, user, lvl in rows:
-        result.append({
-            "user_id": user.id,
-            "full_name": user.full_name,
-            "email": user.email,
-            "lifetime_points": bal.lifetime_points or 0,
-            "level": lvl.level if lvl else "Beginner"
-        })
-    return result
+    if period is None:
+        return leaderboard.top(db, limit=limit, offset=offset)
+    if period not in period_leaderboard.PERIODS:
+        raise HTTPException(status_code=400, detail="period must be week or month")
+    return period_leaderboard.top(db, period, limit=limit, offset=offset)
+
+@router.get("/leaderboard/me", response_model=schemas.LeaderboardRankResponse)
+def get_my_rank(
+    current_user: models.User = Depends(dependencies.get_current_user),
+    db: Session = Depends(get_db)
+):
+    return leaderboard.rank(db, current_user.id)
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from .. import models, schemas, dependencies
 from ..database import get_db
+from ..pagination import MAX_LIMIT, paginate
 from ..services import marketplace_service
 from ..services import pricing_service
 from ..config import settings
@@ -13,6 +14,7 @@ from ..database import get_db
 from ..services import purchase_service
 from ..services import logging_service
 from ..services import credit_transfer_service
+from ..services import carbon_totals
 from sqlalchemy import func
 
 router = APIRouter(prefix="/marketplace", tags=["marketplace"])
@@ -20,8 +22,8 @@ router = APIRouter(prefix="/marketplace", tags=["marketplace"])
 @router.get("/listings")
 def get_listings(
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 50
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_LIMIT)
 ):
     rows = marketplace_service.get_available_listings(db, skip, limit)
     return [
@@ -155,12 +157,15 @@ def verify_company_payment(payload: dict, token: str, db: Session = Depends(get_
             payment_id=None,
         )
         db.add(seller_tx)
+        db.flush()
+        carbon_totals.apply_delta(db, listing.seller_user_id, transactions=1)
     tx = models.MarketplaceTransaction(
         buyer_company_id=comp.id,
         seller_user_id=listing.seller_user_id if listing else None,
         credit_amount=order.credit_amount,
         total_price=order.total_price,
         blockchain_tx_hash=res.get("tx_hash"),
+        order_id=order.id,
     )
     db.add(tx)
     db.commit()
@@ -169,13 +174,14 @@ def verify_company_payment(payload: dict, token: str, db: Session = Depends(get_
 
 @router.get("/history")
 def get_history(
+    response: Response,
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 50
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None
 ):
-    rows = db.query(models.MarketplaceTransaction)\
-        .order_by(models.MarketplaceTransaction.created_at.desc())\
-        .offset(skip).limit(limit).all()
+    query = db.query(models.MarketplaceTransaction)
+    rows = paginate(query, (models.MarketplaceTransaction.created_at, models.MarketplaceTransaction.id), response, limit, cursor, skip)
     return [
         {
             "id": r.id,
@@ -5,7 +5,7 @@ import json
 
 from jose import jwt, JWTError
 
-from ..database import get_db
+from ..database import get_db, release_connection
 from .. import models, dependencies
 from ..config import settings
 from ..services import (
@@ -14,8 +14,7 @@ from ..services import (
     upi_service,
     carbon,
     eco_points,
-    reward_rules,
-    badges,
+    reward_orchestrator,
     gemini_upi_insights_service,
 )
 
@@ -257,28 +256,12 @@ def scan_and_pay(
         transaction_id=transaction.id,
         amount=transaction.amount,
         category=carbon_category,
+        spent=transaction.amount,
     )
 
-    eco_points.award_points_for_carbon_saving(
-        db=db,
-        user_id=user_id,
-        transaction_id=transaction.id,
-        carbon_record_id=carbon_record.id,
-    )
-    reward_rules.apply_rules_for_transaction(
-        db=db,
-        user_id=user_id,
-        transaction_id=transaction.id,
-        carbon_record_id=carbon_record.id,
-    )
-    badges.award_badges_for_transaction(
-        db=db,
-        user_id=user_id,
-        transaction_id=transaction.id,
-        carbon_record_id=carbon_record.id,
-    )
-
-    eco_points.auto_convert_threshold(db, user_id)
+    rewards = reward_orchestrator.RewardContext(db, user_id)
+    rewards.record_carbon(transaction.id, carbon_record)
+    rewards.finish()
     db.commit()
     db.refresh(transaction)
 
@@ -365,11 +348,9 @@ def get_upi_transaction_insight(
         and upi_tx.receiver_upi_id != upi_account.vpa
     ):
         raise HTTPException(status_code=403, detail="Not allowed to view this transaction")
-    insight = gemini_upi_insights_service.analyze_transaction(
-        db=db,
-        transaction_id=transaction_id,
-        user_id=current_user.id,
-    )
+    prompt, fallback = gemini_upi_insights_service.build_prompt(db, transaction_id)
+    release_connection(db)
+    insight = gemini_upi_insights_service.generate_insight(prompt, fallback)
     return {
         "transaction_id": transaction_id,
         "insight": insight,
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from decimal import Decimal
+from typing import Optional
 from .. import models, schemas, dependencies
-from ..database import get_db
+from ..database import get_db, release_connection
+from ..pagination import MAX_LIMIT, paginate
 from ..config import settings
 from ..services import blockchain
 
@@ -25,21 +27,20 @@ def get_token_balance(
     else:
         if not settings.CHAIN_RPC_URL or not settings.ECO_TOKEN_ADDRESS:
             raise HTTPException(status_code=500, detail="Blockchain not configured")
-        bal = blockchain.get_balance(wallet.address)
+        release_connection(db)
+        bal = blockchain.get_cached_balance(wallet.address)
         eco = float(Decimal(bal) / Decimal(10**18))
     return {"wallet_address": wallet.address, "eco_tokens": eco}
 
 @router.get("/history", response_model=list[schemas.TokenHistoryItem])
 def get_token_history(
+    response: Response,
     current_user: models.User = Depends(dependencies.get_current_user),
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 50
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None
 ):
-    rows = db.query(models.EcoTokenConversion)\
-        .filter(models.EcoTokenConversion.user_id == current_user.id)\
-        .order_by(models.EcoTokenConversion.created_at.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    return rows
+    query = db.query(models.EcoTokenConversion)\
+        .filter(models.EcoTokenConversion.user_id == current_user.id)
+    return paginate(query, (models.EcoTokenConversion.created_at, models.EcoTokenConversion.id), response, limit, cursor, skip)
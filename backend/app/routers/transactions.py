@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from typing import List, Optional
 from .. import models, schemas, dependencies
 from ..database import get_db
-from ..services import carbon, eco_points, reward_rules, user_level, badges, challenges
+from ..pagination import MAX_LIMIT, paginate
+from ..config import settings
+from ..services import carbon, reward_orchestrator, dashboard_snapshot
+from ..services import transaction_ingest_service
 
 router = APIRouter(
     prefix="/transactions",
@@ -42,34 +44,50 @@ def create_transaction(
         user_id=current_user.id,
         transaction_id=db_transaction.id,
         amount=db_transaction.amount,
-        category=db_transaction.category
-    )
-    challenges.update_on_transaction(db, current_user.id)
-    eco_points.award_points_for_carbon_saving(
-        db=db,
-        user_id=current_user.id,
-        transaction_id=db_transaction.id,
-        carbon_record_id=carbon_record.id
-    )
-    reward_rules.apply_rules_for_transaction(
-        db=db,
-        user_id=current_user.id,
-        transaction_id=db_transaction.id,
-        carbon_record_id=carbon_record.id
-    )
-    badges.award_badges_for_transaction(
-        db=db,
-        user_id=current_user.id,
-        transaction_id=db_transaction.id,
-        carbon_record_id=carbon_record.id
+        category=db_transaction.category,
+        spent=db_transaction.amount if db_transaction.type == "debit" else 0
     )
+    rewards = reward_orchestrator.RewardContext(db, current_user.id)
+    rewards.record_carbon(db_transaction.id, carbon_record)
+    rewards.finish()
     
     db.commit()
     db.refresh(db_transaction)
     
     return db_transaction
 
-from datetime import datetime, timezone
+@router.post("/bulk", response_model=schemas.TransactionBulkResponse)
+def create_transactions_bulk(
+    payload: schemas.TransactionBulkCreate,
+    current_user: models.User = Depends(dependencies.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create a batch of transactions in one request.
+    Carbon records, savings and rewards are computed for the whole batch
+    and written with multi-row inserts.
+    """
+    if not payload.transactions:
+        raise HTTPException(status_code=400, detail="No transactions provided")
+    if len(payload.transactions) > settings.BULK_INGEST_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.BULK_INGEST_MAX_ITEMS} transactions"
+        )
+    entries = [
+        {
+            "user_id": current_user.id,
+            "amount": t.amount,
+            "currency": t.currency,
+            "type": t.type,
+            "category": t.category,
+            "description": t.description,
+        }
+        for t in payload.transactions
+    ]
+    result = transaction_ingest_service.ingest_transactions(db, entries)
+    db.commit()
+    return result
 
 @router.get("/summary", response_model=schemas.DashboardSummary)
 def get_dashboard_summary(
@@ -81,132 +99,23 @@ def get_dashboard_summary(
     Includes total spent, total count, last 5 transactions,
     and carbon footprint stats.
     """
-    # 1. Transaction Stats
-    # Total spent (sum of completed debits)
-    total_spent = db.query(func.sum(models.Transaction.amount))\
-        .filter(
-            models.Transaction.user_id == current_user.id,
-            models.Transaction.type == "debit",
-            models.Transaction.status == "completed"
-        ).scalar() or 0
-
-    # Total transaction count
-    count = db.query(func.count(models.Transaction.id))\
-        .filter(models.Transaction.user_id == current_user.id)\
-        .scalar() or 0
-
-    # Last 5 transactions
-    recent = db.query(models.Transaction)\
-        .filter(models.Transaction.user_id == current_user.id)\
-        .order_by(models.Transaction.created_at.desc())\
-        .limit(5)\
-        .all()
-        
-    # 2. Carbon Stats
-    # Total Carbon
-    total_carbon = db.query(func.sum(models.CarbonRecord.carbon_emission))\
-        .filter(models.CarbonRecord.user_id == current_user.id)\
-        .scalar() or 0.0
-
-    # Monthly Carbon (Current Month)
-    today = datetime.now(timezone.utc)
-    monthly_carbon = db.query(func.sum(models.CarbonRecord.carbon_emission))\
-        .filter(
-            models.CarbonRecord.user_id == current_user.id,
-            func.extract('year', models.CarbonRecord.created_at) == today.year,
-            func.extract('month', models.CarbonRecord.created_at) == today.month
-        ).scalar() or 0.0
-
-    # Daily Average
-    first_record_date = db.query(func.min(models.CarbonRecord.created_at))\
-        .filter(models.CarbonRecord.user_id == current_user.id)\
-        .scalar()
-
-    if first_record_date:
-        # Ensure first_record_date is offset-aware or today is naive to match
-        # DB usually returns offset-aware if column is DateTime(timezone=True)
-        if first_record_date.tzinfo is None:
-            first_record_date = first_record_date.replace(tzinfo=timezone.utc)
-            
-        days_active = (today - first_record_date).days + 1
-        daily_average = total_carbon / days_active
-    else:
-        daily_average = 0.0
-        
-    # Recent Carbon Records
-    recent_carbon = db.query(models.CarbonRecord)\
-        .filter(models.CarbonRecord.user_id == current_user.id)\
-        .order_by(models.CarbonRecord.created_at.desc())\
-        .limit(5)\
-        .all()
-        
-    # Total Carbon Saved
-    total_saved = db.query(func.sum(models.CarbonSaving.saved_amount))\
-        .filter(models.CarbonSaving.user_id == current_user.id)\
-        .scalar() or 0.0
-    
-    # Eco Points Balance
-    eco_bal = db.query(models.EcoPointsBalance).filter(models.EcoPointsBalance.user_id == current_user.id).first()
-    
-    # Eco Score
-    eco_score = db.query(models.EcoScore).filter(models.EcoScore.user_id == current_user.id).first()
-    
-    # Recent Rewards
-    recent_rewards = db.query(models.EcoPointsTransaction)\
-        .filter(models.EcoPointsTransaction.user_id == current_user.id)\
-        .order_by(models.EcoPointsTransaction.created_at.desc())\
-        .limit(5)\
-        .all()
-    
-    # User Level
-    user_lvl = db.query(models.EcoUserLevel).filter(models.EcoUserLevel.user_id == current_user.id).first()
-    if not user_lvl:
-        user_lvl = user_level.update_user_level(db, current_user.id)
-    
-    badges_list = db.query(models.Badge).join(models.UserBadge, models.UserBadge.badge_id == models.Badge.id)\
-        .filter(models.UserBadge.user_id == current_user.id)\
-        .order_by(models.Badge.name.asc())\
-        .limit(20)\
-        .all()
-    
-    streak = db.query(models.EcoStreak).filter(models.EcoStreak.user_id == current_user.id).first()
-    
-    challenges_status = challenges.get_user_challenges_status(db, current_user.id)
-
-    return {
-        "total_spent": total_spent,
-        "transaction_count": count,
-        "recent_transactions": recent,
-        "carbon_summary": {
-            "total_carbon": round(total_carbon, 2),
-            "monthly_carbon": round(monthly_carbon, 2),
-            "daily_average": round(daily_average, 2)
-        },
-        "recent_carbon_records": recent_carbon,
-        "total_carbon_saved": round(total_saved, 2),
-        "eco_points_balance": eco_bal,
-        "eco_score": eco_score if eco_score else {"score": 0.0, "last_updated": None},
-        "recent_rewards": recent_rewards,
-        "user_level": user_lvl,
-        "badges": badges_list,
-        "streak": streak,
-        "challenges": challenges_status
-    }
+    snapshot = dashboard_snapshot.get_snapshot(db, current_user.id)
+    db.commit()
+    return dashboard_snapshot.summary_fields(snapshot)
 
 @router.get("/", response_model=List[schemas.TransactionResponse])
 def get_user_transactions(
+    response: Response,
     current_user: models.User = Depends(dependencies.get_current_user),
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None
 ):
     """
     Get all transactions for the current user.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
     """
-    transactions = db.query(models.Transaction)\
-        .filter(models.Transaction.user_id == current_user.id)\
-        .order_by(models.Transaction.created_at.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    return transactions
+    query = db.query(models.Transaction)\
+        .filter(models.Transaction.user_id == current_user.id)
+    return paginate(query, (models.Transaction.created_at, models.Transaction.id), response, limit, cursor, skip)
@@ -2,11 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import Optional
 from .. import models, schemas, dependencies
-from ..database import get_db
+from ..database import get_db, release_connection
 from ..config import settings
 import os, json
-import httpx
 from ..services import carbon_credit_blockchain_service as cc_chain
+from ..services import dashboard_snapshot, blockchain
 
 router = APIRouter(prefix="/wallet", tags=["wallet"])
 
@@ -48,6 +48,7 @@ def connect_wallet(
         rec.provider = provider
         rec.network = network
     db.add(rec)
+    dashboard_snapshot.mark_stale(db, current_user.id)
     db.commit()
     db.refresh(rec)
     return {"address": rec.address}
@@ -60,7 +61,6 @@ def get_eco_token_balance(
     rec = db.query(models.UserWallet).filter(models.UserWallet.user_id == current_user.id).first()
     if not rec or not rec.address:
         raise HTTPException(status_code=404, detail="Wallet not connected")
-    rpc = settings.CHAIN_RPC_URL or "https://rpc-amoy.polygon.technology"
     token_addr = settings.ECO_TOKEN_ADDRESS
     if not token_addr:
         try:
@@ -73,34 +73,11 @@ def get_eco_token_balance(
             token_addr = None
     if not token_addr:
         raise HTTPException(status_code=500, detail="RPC or token address not configured")
-    addr = rec.address.lower()
-    selector = "0x70a08231"  # balanceOf(address)
-    hex_addr = addr[2:]
-    padded = hex_addr.rjust(64, "0")
-    data = selector + padded
-    body = {
-        "jsonrpc": "2.0",
-        "method": "eth_call",
-        "params": [
-            {"to": settings.ECO_TOKEN_ADDRESS, "data": data},
-            "latest"
-        ],
-        "id": 1
-    }
+    release_connection(db)
     try:
-        with httpx.Client(timeout=10) as client:
-            resp = client.post(rpc, json=body)
-            resp.raise_for_status()
-            out = resp.json()
+        value = int(blockchain.get_cached_balance(rec.address, token_addr))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RPC error: {str(e)}")
-    result = out.get("result")
-    if not result or not isinstance(result, str):
-        raise HTTPException(status_code=500, detail="Invalid RPC response")
-    try:
-        value = int(result, 16)
-    except Exception:
-        value = 0
     return {"address": rec.address, "balance_wei": value, "balance": value / (10**18)}
 
 @router.get("/cct-balance")
@@ -111,8 +88,9 @@ def get_cct_token_balance(
     rec = db.query(models.UserWallet).filter(models.UserWallet.user_id == current_user.id).first()
     if not rec or not rec.address:
         raise HTTPException(status_code=404, detail="Wallet not connected")
+    release_connection(db)
     try:
-        bal = cc_chain.get_credit_balance(rec.address)
+        bal = cc_chain.get_cached_credit_balance(rec.address)
         return {"address": rec.address, "balance": float(bal)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chain error: {str(e)}")
@@ -0,0 +1,223 @@
+from sqlalchemy import Column, Date, Integer, MetaData, Table, func, inspect, select, text, Index
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from . import models
+
+# create_all only creates missing tables. Columns, indexes and constraints
+# added to existing tables are applied here, once per database, in order.
+
+_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+
+def _add_column(conn: Connection, column):
+    table = column.table.name
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column.name in existing:
+        return
+    ddl_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column.name} {ddl_type}"))
+
+
+def _create_index(conn: Connection, index: Index):
+    existing = {i["name"] for i in inspect(conn).get_indexes(index.table.name)}
+    if index.name not in existing:
+        index.create(conn)
+
+
+def _create_unique(conn: Connection, table: str, name: str, columns: tuple[str, ...]):
+    existing = {c["name"] for c in inspect(conn).get_unique_constraints(table)}
+    existing |= {i["name"] for i in inspect(conn).get_indexes(table)}
+    if name in existing:
+        return
+    cols = ", ".join(columns)
+    # Older writers could race into duplicate rows; keep the first
+    conn.execute(text(
+        f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {cols})"
+    ))
+    conn.execute(text(f"CREATE UNIQUE INDEX {name} ON {table} ({cols})"))
+
+
+def _v1_leaderboard_index(conn: Connection):
+    _create_index(conn, Index(
+        "ix_eco_points_balance_lifetime_points",
+        models.EcoPointsBalance.__table__.c.lifetime_points
+    ))
+
+
+def _v2_time_boxed_challenges(conn: Connection):
+    _add_column(conn, models.Challenge.__table__.c.starts_at)
+    _add_column(conn, models.Challenge.__table__.c.ends_at)
+    _create_unique(conn, "user_challenge_progress", "uq_challenge_progress_user_challenge", ("user_id", "challenge_id"))
+
+
+def _v3_badge_catalog(conn: Connection):
+    _add_column(conn, models.Badge.__table__.c.metric)
+    _add_column(conn, models.Badge.__table__.c.threshold)
+    _create_unique(conn, "user_badges", "uq_user_badges_user_badge", ("user_id", "badge_id"))
+
+
+def _model_index(model, name: str) -> Index:
+    return next(i for i in model.__table__.indexes if i.name == name)
+
+
+# (model, index name) pairs; benchmark_indexes.py measures these
+KEYSET_INDEXES = (
+    (models.Transaction, "ix_transactions_user_created"),
+    (models.CarbonRecord, "ix_carbon_records_user_created"),
+    (models.CarbonSaving, "ix_carbon_savings_user_created"),
+    (models.EcoPointsTransaction, "ix_eco_points_transactions_user_created"),
+    (models.EcoTokenConversion, "ix_eco_token_conversions_user_created"),
+    (models.MarketplaceTransaction, "ix_marketplace_transactions_created"),
+    (models.CarbonCreditListing, "ix_carbon_credit_listings_status_created"),
+)
+
+HOT_PATH_INDEXES = (
+    (models.Transaction, "ix_transactions_user_type_status"),
+    (models.CarbonSaving, "ix_carbon_savings_record"),
+    (models.EcoPointsTransaction, "ix_eco_points_transactions_user_action"),
+)
+
+
+def _v4_keyset_indexes(conn: Connection):
+    for model, name in KEYSET_INDEXES:
+        _create_index(conn, _model_index(model, name))
+
+
+def _v5_hot_path_indexes(conn: Connection):
+    for model, name in HOT_PATH_INDEXES:
+        _create_index(conn, _model_index(model, name))
+
+
+def _v6_carbon_rollups(conn: Connection):
+    from .services import carbon_rollups
+    if conn.execute(select(models.CarbonRollup.id).limit(1)).first():
+        return
+    record, saving = models.CarbonRecord, models.CarbonSaving
+    day = func.date(record.created_at, type_=Date)
+    entries = [
+        {"user_id": r.user_id, "category": r.category, "at": r.day,
+         "emitted": r.emitted, "spent": r.spent, "count": r.count}
+        for r in conn.execute(
+            select(
+                record.user_id, record.category, day.label("day"),
+                func.sum(record.carbon_emission).label("emitted"),
+                func.sum(record.amount).label("spent"),
+                func.count(record.id).label("count")
+            ).where(record.created_at.isnot(None)).group_by(record.user_id, record.category, day)
+        )
+    ]
+    entries += [
+        {"user_id": r.user_id, "category": r.category, "at": r.day, "saved": r.saved}
+        for r in conn.execute(
+            select(
+                saving.user_id, record.category, day.label("day"),
+                func.sum(saving.saved_amount).label("saved")
+            ).join(record, record.id == saving.carbon_record_id)
+            .where(record.created_at.isnot(None))
+            .group_by(saving.user_id, record.category, day)
+        )
+    ]
+    with Session(bind=conn) as db:
+        for i in range(0, len(entries), 500):
+            carbon_rollups.add(db, entries[i:i + 500])
+
+
+def _v7_carbon_cube(conn: Connection):
+    from .services import carbon_cube
+    if conn.execute(select(models.CarbonCube.id).limit(1)).first():
+        return
+    with Session(bind=conn) as db:
+        carbon_cube.rebuild(db)
+
+
+def _v8_mint_receipts(conn: Connection):
+    _add_column(conn, models.MarketplaceOrder.__table__.c.tx_status)
+    _create_index(conn, _model_index(models.MarketplaceOrder, "ix_marketplace_orders_tx_status"))
+    _create_index(conn, _model_index(models.EcoTokenConversion, "ix_eco_token_conversions_status"))
+
+
+def _v9_mint_batches(conn: Connection):
+    _add_column(conn, models.EcoTokenConversion.__table__.c.wallet_address)
+    _add_column(conn, models.MarketplaceTransaction.__table__.c.order_id)
+    _create_index(conn, _model_index(models.MarketplaceTransaction, "ix_marketplace_transactions_order_id"))
+
+
+def _v10_auto_convert_sweep(conn: Connection):
+    _create_index(conn, Index(
+        "ix_eco_points_balance_total_points",
+        models.EcoPointsBalance.__table__.c.total_points
+    ))
+
+
+def _v11_running_spend(conn: Connection):
+    _add_column(conn, models.UserCarbonTotals.__table__.c.spent)
+    totals = models.UserCarbonTotals.__table__
+    tx = models.Transaction.__table__
+    spent = select(func.coalesce(func.sum(tx.c.amount), 0))\
+        .where(tx.c.user_id == totals.c.user_id, tx.c.type == "debit", tx.c.status == "completed")\
+        .scalar_subquery()
+    conn.execute(totals.update().where(totals.c.spent.is_(None)).values(spent=spent))
+
+
+def _v12_mint_send_tracking(conn: Connection):
+    for model in (models.EcoTokenConversion, models.MarketplaceOrder):
+        _add_column(conn, model.__table__.c.tx_nonce)
+        _add_column(conn, model.__table__.c.sent_at)
+
+
+def _v13_order_mint_attempts(conn: Connection):
+    _add_column(conn, models.MarketplaceOrder.__table__.c.mint_attempts)
+
+
+def _v14_cube_without_owner(conn: Connection):
+    from .services import carbon_cube
+    if "owner_type" not in {c["name"] for c in inspect(conn).get_columns("carbon_cube")}:
+        return
+    # The cube is derived from the daily rollups: recreate it on the new key
+    for model in (models.CarbonCubeDelta, models.CarbonCube):
+        model.__table__.drop(conn)
+        model.__table__.create(conn)
+    with Session(bind=conn) as db:
+        carbon_cube.rebuild(db)
+
+
+UPGRADES = [
+    (1, _v1_leaderboard_index),
+    (2, _v2_time_boxed_challenges),
+    (3, _v3_badge_catalog),
+    (4, _v4_keyset_indexes),
+    (5, _v5_hot_path_indexes),
+    (6, _v6_carbon_rollups),
+    (7, _v7_carbon_cube),
+    (8, _v8_mint_receipts),
+    (9, _v9_mint_batches),
+    (10, _v10_auto_convert_sweep),
+    (11, _v11_running_spend),
+    (12, _v12_mint_send_tracking),
+    (13, _v13_order_mint_attempts),
+    (14, _v14_cube_without_owner),
+]
+
+
+def upgrade(engine):
+    """
+    Applies pending upgrades after create_all. Fresh databases already have
+    the full schema; every step is written to be a no-op there.
+    """
+    with engine.begin() as conn:
+        _metadata.create_all(conn)
+        current = conn.execute(select(schema_version.c.version).where(schema_version.c.id == 1)).scalar()
+        if current is None:
+            conn.execute(schema_version.insert().values(id=1, version=0))
+            current = 0
+        for version, step in UPGRADES:
+            if version <= current:
+                continue
+            step(conn)
+            conn.execute(schema_version.update().where(schema_version.c.id == 1).values(version=version))
@@ -181,6 +181,14 @@ class TransactionResponse(TransactionBase):
     class Config:
         from_attributes = True
 
+class TransactionBulkCreate(BaseModel):
+    transactions: List[TransactionCreate]
+
+class TransactionBulkResponse(BaseModel):
+    created: int
+    transaction_ids: List[int]
+    points_awarded: int
+
  
 
 class EmissionFactorBase(BaseModel):
@@ -259,6 +267,8 @@ class ChallengeStatusResponse(BaseModel):
     progress_value: float
     completed: bool
     completed_at: Optional[datetime] = None
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
  
     class Config:
         from_attributes = True
@@ -277,7 +287,14 @@ class LeaderboardEntryResponse(BaseModel):
     full_name: Optional[str] = None
     email: EmailStr
     lifetime_points: int
+    period_points: Optional[int] = None
     level: str
+
+class LeaderboardRankResponse(BaseModel):
+    user_id: int
+    lifetime_points: int
+    rank: int
+    total_users: int
  
 class DashboardSummary(BaseModel):
     total_spent: int
@@ -302,15 +319,17 @@ class EcoTokenConversionResponse(BaseModel):
     tx_hash: str
     points_converted: int
     token_amount: float
+    status: Optional[str] = None
 
 class TokenBalanceResponse(BaseModel):
     wallet_address: str
     eco_tokens: float
 
 class TokenHistoryItem(BaseModel):
-    tx_hash: str
+    tx_hash: Optional[str] = None
     token_amount: float
     points: int
+    status: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator
+from sqlalchemy import select
+from ..database import SessionLocal
+from .. import models
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+BATCH_SIZE = 1000
+
+T = models.Transaction
+R = models.CarbonRecord
+S = models.CarbonSaving
+P = models.EcoPointsTransaction
+
+COLUMNS = [
+    ("transaction_id", T.id),
+    ("created_at", T.created_at),
+    ("amount", T.amount),
+    ("currency", T.currency),
+    ("type", T.type),
+    ("category", T.category),
+    ("description", T.description),
+    ("status", T.status),
+    ("carbon_record_id", R.id),
+    ("carbon_category", R.category),
+    ("emission_factor", R.emission_factor),
+    ("carbon_emission_kg", R.carbon_emission),
+    ("carbon_saving_id", S.id),
+    ("saved_kg", S.saved_amount),
+    ("eco_points_id", P.id),
+    ("eco_points", P.points),
+    ("eco_points_action", P.action_type),
+    ("eco_points_description", P.description),
+]
+FIELDS = [name for name, _ in COLUMNS]
+
+
+def _statement(user_id: int):
+    # One output row per (transaction, points entry); transactions without
+    # carbon or points data still appear with empty columns
+    return select(*[col for _, col in COLUMNS])\
+        .select_from(T)\
+        .outerjoin(R, (R.transaction_id == T.id) & (R.user_id == user_id))\
+        .outerjoin(S, (S.carbon_record_id == R.id) & (S.user_id == user_id))\
+        .outerjoin(P, (P.transaction_id == T.id) & (P.user_id == user_id))\
+        .where(T.user_id == user_id)\
+        .order_by(T.created_at.asc(), T.id.asc(), R.id.asc(), S.id.asc(), P.id.asc())\
+        .execution_options(yield_per=BATCH_SIZE)
+
+
+def _rows(user_id: int) -> Iterator[dict]:
+    """
+    Streams the user's joined activity rows through a server-side cursor on
+    its own session, so the request's session can close while we stream.
+    """
+    db = SessionLocal()
+    try:
+        for row in db.execute(_statement(user_id)):
+            yield dict(zip(FIELDS, row))
+    finally:
+        db.close()
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(user_id: int) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=FIELDS)
+
+    def drain() -> str:
+        text = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return text
+
+    writer.writeheader()
+    yield drain()
+    for i, row in enumerate(_rows(user_id), 1):
+        writer.writerow({k: _plain(v) for k, v in row.items()})
+        if i % BATCH_SIZE == 0:
+            yield drain()
+    tail = drain()
+    if tail:
+        yield tail
+
+
+def stream_ndjson(user_id: int) -> Iterator[str]:
+    chunk = []
+    for row in _rows(user_id):
+        chunk.append(json.dumps({k: _plain(v) for k, v in row.items()}))
+        if len(chunk) >= BATCH_SIZE:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def stream(user_id: int, fmt: str) -> Iterator[str]:
+    return stream_csv(user_id) if fmt == "csv" else stream_ndjson(user_id)
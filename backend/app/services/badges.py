@@ -1,62 +1,126 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from bisect import bisect_right
+from typing import Mapping, NamedTuple
+import threading
+import time
 from .. import models
+from ..config import settings
+from ..database import dialect_insert
 
+# (code, name, description, metric, threshold)
 DEFAULT_BADGES = [
-    ("FIRST_TRANSACTION", "First Transaction", "Completed the first transaction"),
-    ("LOW_CARBON_USER", "Low Carbon User", "Made a low-carbon transaction"),
-    ("ECO_SAVER", "Eco Saver", "Saved 10 kg CO₂"),
-    ("CARBON_CHAMPION", "Carbon Champion", "Saved 50 kg CO₂"),
-    ("POINTS_500", "Eco Starter", "Reached 500 points"),
-    ("POINTS_1500", "Eco Warrior", "Reached 1500 points"),
-    ("POINTS_3000", "Eco Hero", "Reached 3000 points"),
-    ("POINTS_5000", "Carbon Champion", "Reached 5000 points"),
+    ("FIRST_TRANSACTION", "First Transaction", "Completed the first transaction", "transactions", 1),
+    ("LOW_CARBON_USER", "Low Carbon User", "Made a low-carbon transaction", "low_carbon_transactions", 1),
+    ("ECO_SAVER", "Eco Saver", "Saved 10 kg CO₂", "saved_kg", 10.0),
+    ("CARBON_CHAMPION", "Carbon Champion", "Saved 50 kg CO₂", "saved_kg", 50.0),
+    ("POINTS_500", "Eco Starter", "Reached 500 points", "points", 500),
+    ("POINTS_1500", "Eco Warrior", "Reached 1500 points", "points", 1500),
+    ("POINTS_3000", "Eco Hero", "Reached 3000 points", "points", 3000),
+    ("POINTS_5000", "Carbon Champion", "Reached 5000 points", "points", 5000),
 ]
 
+
+class BadgeRule(NamedTuple):
+    badge_id: int
+    code: str
+    threshold: float
+
+
+class _MetricRules(NamedTuple):
+    thresholds: tuple[float, ...]
+    rules: tuple[BadgeRule, ...]
+
+
+_lock = threading.Lock()
+_catalog: Mapping[str, _MetricRules] | None = None
+_loaded_at = 0.0
+
+
 def seed_default_badges(db: Session):
-    for code, name, desc in DEFAULT_BADGES:
-        exists = db.query(models.Badge).filter(models.Badge.code == code).first()
-        if not exists:
-            db.add(models.Badge(code=code, name=name, description=desc))
+    existing = {b.code: b for b in db.query(models.Badge).all()}
+    for code, name, desc, metric, threshold in DEFAULT_BADGES:
+        b = existing.get(code)
+        if not b:
+            db.add(models.Badge(code=code, name=name, description=desc, metric=metric, threshold=threshold))
+        elif b.metric is None:
+            b.metric = metric
+            b.threshold = threshold
+            db.add(b)
     db.commit()
+    refresh(db)
+
+
+def refresh(db: Session) -> Mapping[str, _MetricRules]:
+    """
+    Reloads badge rules into an in-process catalog keyed by metric, each
+    sorted by threshold. Call after anything that writes to badges.
+    """
+    global _catalog, _loaded_at
+    rows = db.query(models.Badge)\
+        .filter(models.Badge.metric.isnot(None), models.Badge.threshold.isnot(None))\
+        .all()
+    by_metric: dict[str, list[BadgeRule]] = {}
+    for b in rows:
+        by_metric.setdefault(b.metric, []).append(BadgeRule(b.id, b.code, float(b.threshold)))
+    catalog = {}
+    for metric, rules in by_metric.items():
+        rules.sort(key=lambda r: r.threshold)
+        catalog[metric] = _MetricRules(tuple(r.threshold for r in rules), tuple(rules))
+    with _lock:
+        _catalog = catalog
+        _loaded_at = time.monotonic()
+    return catalog
+
+
+def _get_catalog(db: Session) -> Mapping[str, _MetricRules]:
+    catalog = _catalog
+    ttl = settings.BADGE_CATALOG_TTL_SECONDS
+    if catalog is None or (ttl > 0 and time.monotonic() - _loaded_at > ttl):
+        catalog = refresh(db)
+    return catalog
+
+
+def award_for_metrics(db: Session, user_id: int, metrics: dict) -> int:
+    """
+    Awards every badge whose threshold the given metric values have reached.
+    One bisect per metric finds the crossed rules, one query loads the badges
+    the user already holds and one INSERT ... ON CONFLICT DO NOTHING writes
+    the rest. Returns the number of badge ids attempted.
+    """
+    catalog = _get_catalog(db)
+    crossed = []
+    for metric, value in metrics.items():
+        entry = catalog.get(metric)
+        if entry is None or value is None:
+            continue
+        crossed.extend(entry.rules[:bisect_right(entry.thresholds, float(value))])
+    if not crossed:
+        return 0
+    held = {
+        badge_id for (badge_id,) in db.query(models.UserBadge.badge_id)
+        .filter(models.UserBadge.user_id == user_id)
+        .all()
+    }
+    new_ids = sorted({r.badge_id for r in crossed} - held)
+    if not new_ids:
+        return 0
+    stmt = dialect_insert(db, models.UserBadge).values([
+        {"user_id": user_id, "badge_id": badge_id} for badge_id in new_ids
+    ]).on_conflict_do_nothing(index_elements=["user_id", "badge_id"])
+    db.execute(stmt)
+    return len(new_ids)
+
+
+def transaction_metrics(low_carbon: bool, totals: models.UserCarbonTotals) -> dict:
+    return {
+        "transactions": int(totals.transaction_count or 0),
+        "low_carbon_transactions": 1 if low_carbon else 0,
+        "saved_kg": float(totals.saved_kg or 0.0),
+    }
+
 
-def ensure_awarded(db: Session, user_id: int, code: str):
-    b = db.query(models.Badge).filter(models.Badge.code == code).first()
-    if not b:
-        return None
-    exists = db.query(models.UserBadge).filter(
-        models.UserBadge.user_id == user_id,
-        models.UserBadge.badge_id == b.id
-    ).first()
-    if exists:
-        return exists
-    ub = models.UserBadge(user_id=user_id, badge_id=b.id)
-    db.add(ub)
-    db.flush()
-    db.refresh(ub)
-    return ub
-
-def award_badges_for_transaction(db: Session, user_id: int, transaction_id: int, carbon_record_id: int):
-    count_tx = db.query(func.count(models.Transaction.id)).filter(models.Transaction.user_id == user_id).scalar() or 0
-    if count_tx == 1:
-        ensure_awarded(db, user_id, "FIRST_TRANSACTION")
-    saving = db.query(models.CarbonSaving).filter(models.CarbonSaving.carbon_record_id == carbon_record_id).first()
-    if saving and saving.saved_amount and saving.saved_amount >= 0.1:
-        ensure_awarded(db, user_id, "LOW_CARBON_USER")
-    total_saved = db.query(func.sum(models.CarbonSaving.saved_amount)).filter(models.CarbonSaving.user_id == user_id).scalar() or 0.0
-    if total_saved >= 10.0:
-        ensure_awarded(db, user_id, "ECO_SAVER")
-    if total_saved >= 50.0:
-        ensure_awarded(db, user_id, "CARBON_CHAMPION")
-
-def award_badges_post_points(db: Session, user_id: int):
-    bal = db.query(models.EcoPointsBalance).filter(models.EcoPointsBalance.user_id == user_id).first()
-    total = bal.total_points if bal else 0
-    if total >= 500:
-        ensure_awarded(db, user_id, "POINTS_500")
-    if total >= 1500:
-        ensure_awarded(db, user_id, "POINTS_1500")
-    if total >= 3000:
-        ensure_awarded(db, user_id, "POINTS_3000")
-    if total >= 5000:
-        ensure_awarded(db, user_id, "POINTS_5000")
+def award_badges_post_points(db: Session, user_id: int, total: int | None = None):
+    if total is None:
+        bal = db.query(models.EcoPointsBalance).filter(models.EcoPointsBalance.user_id == user_id).first()
+        total = bal.total_points if bal else 0
+    return award_for_metrics(db, user_id, {"points": int(total or 0)})
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import threading
+import time
+from ..config import settings
+
+_lock = threading.Lock()
+_entries: dict = {}
+_generations: dict = {}
+_refreshing: set = set()
+_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refresh_errors": 0, "invalidations": 0, "evictions": 0}
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="balance-refresh")
+
+
+def _key(token: str, address: str) -> tuple:
+    return token, address.lower()
+
+
+def _store(key: tuple, generation: int, value):
+    with _lock:
+        if _generations.get(key, 0) != generation:
+            return
+        _entries.pop(key, None)
+        _entries[key] = (time.monotonic(), value)
+        while len(_entries) > settings.CHAIN_BALANCE_CACHE_MAX_ENTRIES:
+            _entries.pop(next(iter(_entries)))
+            _stats["evictions"] += 1
+
+
+def _refresh(key: tuple, generation: int, fetch: Callable):
+    try:
+        _store(key, generation, fetch())
+    except Exception:
+        with _lock:
+            _stats["refresh_errors"] += 1
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+
+
+def get(token: str, address: str, fetch: Callable):
+    """
+    Returns the cached on-chain balance of `address` for `token` ("eco" or
+    "cct"). A fresh entry is returned as is; an expired one is returned
+    immediately while a background refresh runs; a missing one is fetched
+    inline. Fetch errors on a miss propagate to the caller.
+    """
+    ttl = settings.CHAIN_BALANCE_CACHE_TTL_SECONDS
+    if ttl <= 0:
+        return fetch()
+    key = _key(token, address)
+    with _lock:
+        entry = _entries.get(key)
+        generation = _generations.get(key, 0)
+        if entry:
+            fetched_at, value = entry
+            if time.monotonic() - fetched_at < ttl:
+                _stats["hits"] += 1
+                return value
+            _stats["stale_hits"] += 1
+            if key not in _refreshing:
+                _refreshing.add(key)
+                _executor.submit(_refresh, key, generation, fetch)
+            return value
+        _stats["misses"] += 1
+    value = fetch()
+    _store(key, generation, value)
+    return value
+
+
+def put(token: str, address: str, value):
+    if settings.CHAIN_BALANCE_CACHE_TTL_SECONDS <= 0:
+        return
+    key = _key(token, address)
+    with _lock:
+        generation = _generations.get(key, 0)
+    _store(key, generation, value)
+
+
+def invalidate(token: str, address: str | None):
+    """
+    Drops a cached balance, e.g. once a mint to the address confirms, so the
+    next read goes to the chain.
+    """
+    if not address:
+        return
+    key = _key(token, address)
+    with _lock:
+        _generations[key] = _generations.get(key, 0) + 1
+        _entries.pop(key, None)
+        _stats["invalidations"] += 1
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            **_stats,
+            "entries": len(_entries),
+            "max_entries": settings.CHAIN_BALANCE_CACHE_MAX_ENTRIES,
+            "ttl_seconds": settings.CHAIN_BALANCE_CACHE_TTL_SECONDS,
+        }
@@ -0,0 +1,49 @@
+from eth_abi import decode, encode
+from web3 import Web3
+from ..config import settings
+from . import chain_client
+
+CHUNK_SIZE = 500
+BALANCE_OF_SELECTOR = bytes.fromhex("70a08231")
+
+BALANCE_OF_ABI = [
+    {"inputs":[{"internalType":"address","name":"account","type":"address"}],"name":"balanceOf","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
+]
+MULTICALL3_ABI = [
+    {"inputs":[{"components":[{"internalType":"address","name":"target","type":"address"},{"internalType":"bool","name":"allowFailure","type":"bool"},{"internalType":"bytes","name":"callData","type":"bytes"}],"internalType":"struct Multicall3.Call3[]","name":"calls","type":"tuple[]"}],"name":"aggregate3","outputs":[{"components":[{"internalType":"bool","name":"success","type":"bool"},{"internalType":"bytes","name":"returnData","type":"bytes"}],"internalType":"struct Multicall3.Result[]","name":"returnData","type":"tuple[]"}],"stateMutability":"payable","type":"function"},
+]
+
+
+def _multicall(token: str, addresses: list[str]) -> list[int | None]:
+    multicall = chain_client.get_contract(settings.CHAIN_MULTICALL_ADDRESS, MULTICALL3_ABI)
+    calls = [(token, True, BALANCE_OF_SELECTOR + encode(["address"], [a])) for a in addresses]
+    results = multicall.functions.aggregate3(calls).call()
+    return [decode(["uint256"], data)[0] if ok and len(data) >= 32 else None for ok, data in results]
+
+
+def _rpc_batch(token: str, addresses: list[str]) -> list[int | None]:
+    w3 = chain_client.get_w3()
+    contract = chain_client.get_contract(token, BALANCE_OF_ABI)
+    with w3.batch_requests() as batch:
+        for a in addresses:
+            batch.add(contract.functions.balanceOf(a))
+        results = batch.execute()
+    return [r if isinstance(r, int) else None for r in results]
+
+
+def balances_of(token_address: str, addresses) -> dict[str, int | None]:
+    """
+    Reads balanceOf for many addresses of one ERC-20 in as few round trips
+    as possible: one Multicall3 aggregate3 eth_call per CHUNK_SIZE addresses,
+    or one JSON-RPC batch per chunk when CHAIN_MULTICALL_ADDRESS is unset.
+    Returns balances in wei keyed by lower-cased address; None marks a read
+    that failed.
+    """
+    token = Web3.to_checksum_address(token_address)
+    unique = list(dict.fromkeys(Web3.to_checksum_address(a) for a in addresses if a))
+    read = _multicall if settings.CHAIN_MULTICALL_ADDRESS else _rpc_batch
+    out = {}
+    for i in range(0, len(unique), CHUNK_SIZE):
+        chunk = unique[i:i + CHUNK_SIZE]
+        out.update(zip((a.lower() for a in chunk), read(token, chunk)))
+    return out
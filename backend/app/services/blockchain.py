@@ -1,34 +1,41 @@
 from web3 import Web3
 from eth_account import Account
 from ..config import settings
+from . import balance_cache, balance_reader, chain_client, tx_sender
 import os
 
 ABI = [
     {"inputs":[{"internalType":"address","name":"to","type":"address"},{"internalType":"uint256","name":"amount","type":"uint256"}],"name":"mint","outputs":[],"stateMutability":"nonpayable","type":"function"},
+    {"inputs":[{"internalType":"address[]","name":"to","type":"address[]"},{"internalType":"uint256[]","name":"amounts","type":"uint256[]"}],"name":"mintBatch","outputs":[],"stateMutability":"nonpayable","type":"function"},
     {"inputs":[{"internalType":"address","name":"account","type":"address"}],"name":"balanceOf","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
     {"inputs":[],"name":"owner","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},
 ]
 
-def get_w3():
-    return Web3(Web3.HTTPProvider(settings.CHAIN_RPC_URL))
+def get_w3() -> Web3:
+    return chain_client.get_w3()
 
-def get_contract(w3: Web3):
-    addr = Web3.to_checksum_address(settings.ECO_TOKEN_ADDRESS)
-    return w3.eth.contract(address=addr, abi=ABI)
+def get_contract(token_address: str | None = None):
+    return chain_client.get_contract(token_address or settings.ECO_TOKEN_ADDRESS, ABI)
 
-def get_balance(address: str) -> int:
-    w3 = get_w3()
-    c = get_contract(w3)
+def get_balance(address: str, token_address: str | None = None) -> int:
+    c = get_contract(token_address)
     return c.functions.balanceOf(Web3.to_checksum_address(address)).call()
 
+def get_cached_balance(address: str, token_address: str | None = None) -> int:
+    return balance_cache.get("eco", address, lambda: get_balance(address, token_address))
+
+def get_balances(addresses: list[str], token_address: str | None = None) -> dict[str, int | None]:
+    balances = balance_reader.balances_of(token_address or settings.ECO_TOKEN_ADDRESS, addresses)
+    for address, value in balances.items():
+        if value is not None:
+            balance_cache.put("eco", address, value)
+    return balances
+
 def get_owner() -> str:
-    w3 = get_w3()
-    c = get_contract(w3)
+    c = get_contract()
     return c.functions.owner().call()
 
-def mint(to_address: str, amount_wei: int):
-    w3 = get_w3()
-    c = get_contract(w3)
+def _owner_key() -> str:
     key = settings.ECO_TOKEN_OWNER_PRIVATE_KEY
     if not key:
         try:
@@ -45,17 +52,27 @@ def mint(to_address: str, amount_wei: int):
         raise Exception("Owner key not configured")
     if not key.startswith("0x"):
         key = "0x" + key
+    return key
+
+def owner_address() -> str:
+    return Account.from_key(_owner_key()).address
+
+def _send(call, on_signed=None) -> str:
+    w3 = get_w3()
+    key = _owner_key()
     acct = Account.from_key(key)
-    nonce = w3.eth.get_transaction_count(acct.address)
-    gas = c.functions.mint(Web3.to_checksum_address(to_address), amount_wei).estimate_gas({"from": acct.address})
-    tx = c.functions.mint(Web3.to_checksum_address(to_address), amount_wei).build_transaction({
-        "from": acct.address,
-        "nonce": nonce,
-        "gas": gas,
+    return tx_sender.send(w3, key, call, {
+        "gas": call.estimate_gas({"from": acct.address}),
         "gasPrice": w3.eth.gas_price,
-        "chainId": w3.eth.chain_id
-    })
-    signed = acct.sign_transaction(tx)
-    txh = w3.eth.send_raw_transaction(signed.rawTransaction)
-    rcpt = w3.eth.wait_for_transaction_receipt(txh)
-    return {"tx_hash": txh.hex(), "block_number": rcpt.blockNumber}
+        "chainId": chain_client.chain_id()
+    }, on_signed=on_signed)
+
+def mint(to_address: str, amount_wei: int):
+    c = get_contract()
+    txh = _send(c.functions.mint(Web3.to_checksum_address(to_address), amount_wei))
+    # receipt_tracker confirms the mint in the background
+    return {"tx_hash": txh, "block_number": None, "status": "pending"}
+
+def mint_batch(recipients: list[str], amounts_wei: list[int], on_signed=None) -> str:
+    c = get_contract()
+    return _send(c.functions.mintBatch([Web3.to_checksum_address(a) for a in recipients], amounts_wei), on_signed=on_signed)
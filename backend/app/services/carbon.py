@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from .. import models
+from . import emission_factors, carbon_totals, carbon_rollups
 
 
 def estimate_carbon_preview(
@@ -7,13 +8,7 @@ def estimate_carbon_preview(
     amount: int,
     category: str,
 ):
-    factor = db.query(models.EmissionFactor).filter(
-        models.EmissionFactor.category == category
-    ).first()
-    if not factor:
-        factor = db.query(models.EmissionFactor).filter(
-            models.EmissionFactor.category == "Other"
-        ).first()
+    factor = emission_factors.resolve(db, category)
     emission_factor_value = factor.co2_per_unit if factor else 0.0003
     amount_inr = amount / 100.0
     carbon_emission = amount_inr * emission_factor_value
@@ -31,7 +26,8 @@ def calculate_and_record_carbon(
     user_id: int,
     transaction_id: int,
     amount: int,
-    category: str
+    category: str,
+    spent: int = 0
 ):
     """
     Calculates carbon emission for a transaction and stores it in the carbon_records table.
@@ -42,18 +38,12 @@ def calculate_and_record_carbon(
         transaction_id: ID of the transaction
         amount: Transaction amount in paisa
         category: Transaction category (e.g., 'Transport', 'Food')
+        spent: Completed debit amount in paisa to add to the user's running spend
     """
     
     # 1. Fetch emission factor
-    # Try to find exact match, otherwise default to 'Other'
-    factor = db.query(models.EmissionFactor).filter(
-        models.EmissionFactor.category == category
-    ).first()
-    
-    if not factor:
-        factor = db.query(models.EmissionFactor).filter(
-            models.EmissionFactor.category == "Other"
-        ).first()
+    # Try to find exact match, otherwise default to 'Other' (resolved from the in-process cache)
+    factor = emission_factors.resolve(db, category)
     
     # Default fallback if 'Other' is missing (shouldn't happen if seeded correctly)
     emission_factor_value = factor.co2_per_unit if factor else 0.0003
@@ -85,6 +75,7 @@ def calculate_and_record_carbon(
     db.refresh(carbon_record)
     
     # 4. Calculate and Record Carbon Savings
+    saved_amount = 0.0
     if factor and factor.baseline_co2_per_unit:
         baseline_emission = amount_inr * factor.baseline_co2_per_unit
         # Savings = Baseline - Actual
@@ -99,5 +90,28 @@ def calculate_and_record_carbon(
             )
             db.add(carbon_saving)
             db.flush() # Ensure ID is generated
+        else:
+            saved_amount = 0.0
+
+    # 5. Keep the per-user running totals in step with the inserted rows
+    carbon_totals.apply_delta(
+        db,
+        user_id,
+        saved=saved_amount,
+        emitted=carbon_emission,
+        transactions=1 if transaction_id else 0,
+        activity_at=carbon_record.created_at,
+        spent=spent
+    )
+    carbon_rollups.record(
+        db,
+        user_id,
+        category,
+        carbon_record.created_at,
+        emitted=carbon_emission,
+        saved=saved_amount,
+        spent=amount,
+        count=1
+    )
     
     return carbon_record
@@ -1,9 +1,11 @@
 from ..config import settings
+from . import balance_cache, balance_reader, chain_client, tx_sender
 import os
 from decimal import Decimal
 
 ABI = [
     {"inputs":[{"internalType":"address","name":"to","type":"address"},{"internalType":"uint256","name":"amount","type":"uint256"}],"name":"mint","outputs":[],"stateMutability":"nonpayable","type":"function"},
+    {"inputs":[{"internalType":"address[]","name":"to","type":"address[]"},{"internalType":"uint256[]","name":"amounts","type":"uint256[]"}],"name":"mintBatch","outputs":[],"stateMutability":"nonpayable","type":"function"},
     {"inputs":[{"internalType":"address","name":"account","type":"address"}],"name":"balanceOf","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
 ]
 
@@ -35,45 +37,73 @@ def _get_owner_key():
     return None
 
 def get_w3():
-    from web3 import Web3
-    url = settings.CHAIN_RPC_URL or "https://rpc-amoy.polygon.technology"
-    return Web3(Web3.HTTPProvider(url))
+    return chain_client.get_w3()
 
-def get_contract(w3):
-    from web3 import Web3
+def get_contract():
     addr = _get_token_address()
     if not addr:
         raise Exception("CarbonCreditToken address not configured")
-    return w3.eth.contract(address=Web3.to_checksum_address(addr), abi=ABI)
+    return chain_client.get_contract(addr, ABI)
 
 def get_credit_balance(address: str) -> Decimal:
     if settings.ECO_TOKEN_DEMO_MODE:
         return Decimal(0)
-    w3 = get_w3()
-    c = get_contract(w3)
+    from web3 import Web3
+    c = get_contract()
     bal = c.functions.balanceOf(Web3.to_checksum_address(address)).call()
     return Decimal(bal) / Decimal(10**18)
 
-def mint_carbon_credit(to_address: str, amount_tokens: Decimal):
+def get_cached_credit_balance(address: str) -> Decimal:
+    return balance_cache.get("cct", address, lambda: get_credit_balance(address))
+
+def get_credit_balances(addresses: list[str]) -> dict[str, Decimal | None]:
     if settings.ECO_TOKEN_DEMO_MODE:
-        return {"tx_hash": "0x" + os.urandom(32).hex(), "block_number": 0}
+        return {a.lower(): Decimal(0) for a in addresses if a}
+    addr = _get_token_address()
+    if not addr:
+        raise Exception("CarbonCreditToken address not configured")
+    out = {}
+    for address, wei in balance_reader.balances_of(addr, addresses).items():
+        out[address] = None if wei is None else Decimal(wei) / Decimal(10**18)
+        if out[address] is not None:
+            balance_cache.put("cct", address, out[address])
+    return out
+
+def owner_address() -> str:
+    key = _get_owner_key()
+    if not key:
+        raise Exception("Owner key not configured")
+    from eth_account import Account
+    return Account.from_key(key).address
+
+def _send(call, gas: int | None = None, on_signed=None) -> str:
     w3 = get_w3()
-    c = get_contract(w3)
     key = _get_owner_key()
     if not key:
         raise Exception("Owner key not configured")
     from eth_account import Account
-    acct = Account.from_key(key)
-    from web3 import Web3
-    amount_wei = int(amount_tokens * Decimal(10**18))
-    tx = c.functions.mint(Web3.to_checksum_address(to_address), amount_wei).build_transaction({
-        "from": acct.address,
-        "nonce": w3.eth.get_transaction_count(acct.address),
-        "gas": 300000,
+    return tx_sender.send(w3, key, call, {
+        "gas": gas or call.estimate_gas({"from": Account.from_key(key).address}),
         "maxFeePerGas": w3.to_wei("10", "gwei"),
         "maxPriorityFeePerGas": w3.to_wei("2", "gwei"),
-    })
-    signed = w3.eth.account.sign_transaction(tx, private_key=key)
-    tx_hash = w3.eth.send_raw_transaction(signed.rawTransaction)
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return {"tx_hash": tx_hash.hex(), "block_number": receipt.blockNumber}
+    }, on_signed=on_signed)
+
+def mint_carbon_credit(to_address: str, amount_tokens: Decimal):
+    if settings.ECO_TOKEN_DEMO_MODE:
+        return {"tx_hash": "0x" + os.urandom(32).hex(), "block_number": 0, "status": "confirmed"}
+    from web3 import Web3
+    c = get_contract()
+    amount_wei = int(amount_tokens * Decimal(10**18))
+    tx_hash = _send(c.functions.mint(Web3.to_checksum_address(to_address), amount_wei), gas=300000)
+    # receipt_tracker confirms the mint in the background
+    return {"tx_hash": tx_hash, "block_number": None, "status": "pending"}
+
+def mint_credit_batch(recipients: list[str], amounts_tokens: list[Decimal], on_signed=None) -> str:
+    if settings.ECO_TOKEN_DEMO_MODE:
+        return "0x" + os.urandom(32).hex()
+    from web3 import Web3
+    c = get_contract()
+    return _send(c.functions.mintBatch(
+        [Web3.to_checksum_address(a) for a in recipients],
+        [int(a * Decimal(10**18)) for a in amounts_tokens]
+    ), on_signed=on_signed)
@@ -1,9 +1,11 @@
+import time
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 from .. import models
 from ..config import settings
+from ..database import dialect_insert
 from . import carbon_credit_blockchain_service as cc_chain
-from decimal import Decimal
+from . import carbon_totals
 
 def ensure_holding(db: Session, user_id: int) -> models.CarbonCreditHolding:
     holding = db.query(models.CarbonCreditHolding).filter(models.CarbonCreditHolding.user_id == user_id).first()
@@ -16,7 +18,7 @@ def ensure_holding(db: Session, user_id: int) -> models.CarbonCreditHolding:
 
 def recalculate_user_holding(db: Session, user_id: int) -> models.CarbonCreditHolding:
     holding = ensure_holding(db, user_id)
-    total_saved = db.query(func.sum(models.CarbonSaving.saved_amount)).filter(models.CarbonSaving.user_id == user_id).scalar() or 0.0
+    total_saved = carbon_totals.get_totals(db, user_id).saved_kg or 0.0
     kg_per_credit = float(settings.CARBON_CREDIT_KG_PER_CREDIT or 1000.0)
     holding.carbon_amount = float(total_saved)
     holding.credit_amount = float(total_saved / kg_per_credit)
@@ -31,21 +33,92 @@ def generate_carbon_credits(db: Session, user_id: int) -> models.CarbonCreditHol
     holding = recalculate_user_holding(db, user_id)
     return holding
 
+def _recalculate_range(db: Session, first_id: int, last_id: int, kg_per_credit: float) -> int:
+    saved = select(
+        models.CarbonSaving.user_id.label("user_id"),
+        func.sum(models.CarbonSaving.saved_amount).label("saved_kg")
+    ).where(models.CarbonSaving.user_id.between(first_id, last_id))\
+        .group_by(models.CarbonSaving.user_id).subquery()
+    carbon = func.coalesce(saved.c.saved_kg, 0.0)
+    rows = select(models.User.id, carbon, carbon / kg_per_credit)\
+        .select_from(models.User)\
+        .outerjoin(saved, saved.c.user_id == models.User.id)\
+        .where(models.User.id.between(first_id, last_id))
+    stmt = dialect_insert(db, models.CarbonCreditHolding)\
+        .from_select(["user_id", "carbon_amount", "credit_amount"], rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "carbon_amount": stmt.excluded.carbon_amount,
+            "credit_amount": stmt.excluded.credit_amount,
+            "updated_at": func.now(),
+        }
+    )
+    return db.execute(stmt).rowcount or 0
+
+def recalculate_all_holdings(db: Session, chunk_size: int | None = None) -> dict:
+    """
+    Rebuilds every user's holding from the carbon savings history with one
+    INSERT ... SELECT ... GROUP BY upsert per user id range, committing after
+    each range so huge tables never hold one long transaction.
+    """
+    chunk_size = max(int(chunk_size or settings.CARBON_CREDIT_RECOMPUTE_CHUNK_SIZE), 1)
+    kg_per_credit = float(settings.CARBON_CREDIT_KG_PER_CREDIT or 1000.0)
+    started = time.perf_counter()
+    low, high = db.query(func.min(models.User.id), func.max(models.User.id)).one()
+    rows = chunks = 0
+    if low is not None:
+        for first_id in range(low, high + 1, chunk_size):
+            rows += _recalculate_range(db, first_id, first_id + chunk_size - 1, kg_per_credit)
+            db.commit()
+            chunks += 1
+    return {"rows": rows, "chunks": chunks, "elapsed_seconds": round(time.perf_counter() - started, 3)}
+
 def convert_savings_to_credits(db: Session):
-    users = db.query(models.User).all()
-    for u in users:
-        recalculate_user_holding(db, u.id)
+    recalculate_all_holdings(db)
     return True
 
-def mint_credit_tokens(db: Session, user_id: int):
-    wallet = db.query(models.UserWallet).filter(models.UserWallet.user_id == user_id).first()
-    if not wallet or not wallet.address:
-        return {"ok": False, "error": "Wallet not connected"}
-    holding = recalculate_user_holding(db, user_id)
-    onchain = cc_chain.get_credit_balance(wallet.address)
-    # Mint delta only
-    delta = float(holding.credit_amount) - float(onchain)
-    if delta <= 0:
-        return {"ok": True, "tx_hash": "", "minted": 0.0}
-    res = cc_chain.mint_carbon_credit(wallet.address, Decimal(str(delta)))
-    return {"ok": True, "tx_hash": res["tx_hash"], "minted": delta}
+def expected_credits(db: Session, user_ids: list[int] | None = None) -> list[dict]:
+    """
+    Earned credits for each connected wallet, from the running carbon totals
+    in one query. Users whose totals row was never built get it backfilled
+    from their savings history first.
+    """
+    kg_per_credit = float(settings.CARBON_CREDIT_KG_PER_CREDIT or 1000.0)
+    query = db.query(models.UserWallet.user_id, models.UserWallet.address, models.UserCarbonTotals.saved_kg)\
+        .outerjoin(models.UserCarbonTotals, models.UserCarbonTotals.user_id == models.UserWallet.user_id)\
+        .filter(models.UserWallet.address.isnot(None))
+    if user_ids is not None:
+        query = query.filter(models.UserWallet.user_id.in_(user_ids))
+    result = []
+    for r in query.order_by(models.UserWallet.user_id.asc()).all():
+        saved = r.saved_kg
+        if saved is None:
+            saved = carbon_totals.get_totals(db, r.user_id).saved_kg
+        result.append({"user_id": r.user_id, "address": r.address, "credits": float(saved or 0.0) / kg_per_credit})
+    return result
+
+def onchain_deltas(expected: list[dict]) -> list[dict]:
+    """
+    Adds each wallet's on-chain CCT balance and the gap to its earned
+    credits, using one batched chain read. Needs no database connection.
+    """
+    if not expected:
+        return []
+    onchain = cc_chain.get_credit_balances([e["address"] for e in expected])
+    result = []
+    for e in expected:
+        balance = onchain.get(e["address"].lower())
+        result.append({
+            **e,
+            "onchain": None if balance is None else float(balance),
+            "delta": None if balance is None else e["credits"] - float(balance),
+        })
+    return result
+
+def credit_deltas(db: Session, user_ids: list[int] | None = None) -> list[dict]:
+    """
+    Compares each connected wallet's earned credits with its on-chain CCT
+    balance.
+    """
+    return onchain_deltas(expected_credits(db, user_ids))
@@ -0,0 +1,231 @@
+import threading
+from sqlalchemy import insert, text, tuple_
+from sqlalchemy.orm import Session
+from datetime import date
+from .. import models
+from ..config import settings
+from ..database import SessionLocal, dialect_insert
+from .hyperloglog import HyperLogLog
+
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def add(db: Session, entries: list[dict], days: list[date]):
+    """
+    Records carbon activity for the platform-wide cube. `entries` use the
+    same shape as carbon_rollups.add; `days` holds each entry's UTC day.
+    Rows are only appended here so concurrent writers never contend on a
+    shared cube cell; fold() merges them into the cube in the background.
+    """
+    rows = []
+    for e, at in zip(entries, days):
+        rows.append({
+            "day": at,
+            "category": e["category"] or "Other",
+            "user_id": e["user_id"],
+            "emitted_kg": float(e.get("emitted") or 0.0),
+            "saved_kg": float(e.get("saved") or 0.0),
+            "spent": int(e.get("spent") or 0),
+            "record_count": int(e.get("count") or 0),
+        })
+    if rows:
+        db.execute(insert(models.CarbonCubeDelta), rows)
+
+
+def _fold_batch(db: Session, limit: int) -> int:
+    deltas = db.query(models.CarbonCubeDelta)\
+        .order_by(models.CarbonCubeDelta.id.asc())\
+        .limit(limit)\
+        .with_for_update(skip_locked=True)\
+        .all()
+    if not deltas:
+        return 0
+    counters: dict = {}
+    users: dict = {}
+    for d in deltas:
+        key = (d.day, d.category)
+        row = counters.setdefault(key, [0.0, 0.0, 0, 0])
+        row[0] += float(d.emitted_kg or 0.0)
+        row[1] += float(d.saved_kg or 0.0)
+        row[2] += int(d.spent or 0)
+        row[3] += int(d.record_count or 0)
+        users.setdefault(key, set()).add(d.user_id)
+    keys = sorted(counters)
+    # Cells are always locked in key order, so concurrent folds cannot deadlock
+    stmt = dialect_insert(db, models.CarbonCube).values([
+        {
+            "day": day,
+            "category": category,
+            "emitted_kg": counters[(day, category)][0],
+            "saved_kg": counters[(day, category)][1],
+            "spent": counters[(day, category)][2],
+            "record_count": counters[(day, category)][3],
+        }
+        for day, category in keys
+    ])
+    cube = models.CarbonCube
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day", "category"],
+        set_={
+            "emitted_kg": cube.emitted_kg + stmt.excluded.emitted_kg,
+            "saved_kg": cube.saved_kg + stmt.excluded.saved_kg,
+            "spent": cube.spent + stmt.excluded.spent,
+            "record_count": cube.record_count + stmt.excluded.record_count,
+        }
+    )
+    db.execute(stmt)
+    cells = db.query(models.CarbonCube)\
+        .filter(tuple_(cube.day, cube.category).in_(keys))\
+        .order_by(cube.day.asc(), cube.category.asc())\
+        .with_for_update()\
+        .populate_existing()\
+        .all()
+    for cell in cells:
+        sketch = HyperLogLog(cell.users_sketch)
+        changed = False
+        for user_id in users[(cell.day, cell.category)]:
+            changed = sketch.add(user_id) or changed
+        if changed:
+            cell.users_sketch = sketch.to_bytes()
+            db.add(cell)
+    db.query(models.CarbonCubeDelta)\
+        .filter(models.CarbonCubeDelta.id.in_([d.id for d in deltas]))\
+        .delete(synchronize_session=False)
+    db.commit()
+    return len(deltas)
+
+
+def fold(db: Session, limit: int = 5000) -> int:
+    """
+    Merges pending deltas into the cube in batches of `limit`, one commit
+    per batch. Deltas are claimed with SKIP LOCKED so folds in several
+    workers take disjoint batches. Returns the number of deltas folded.
+    """
+    folded = 0
+    while True:
+        n = _fold_batch(db, limit)
+        folded += n
+        if n < limit:
+            return folded
+
+
+def rebuild(db: Session, start: date | None = None, end: date | None = None) -> int:
+    """
+    Recomputes cube cells for [start, end] from the per-user daily rollups.
+    Used as the backfill job. Pending deltas in the range are dropped since
+    the rollups already include them. Returns the number of cells written.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Holds off new deltas and folds until the caller commits, so each
+        # record is counted once: in the rollups read below or in a later
+        # delta. On SQLite the delete below takes the database write lock.
+        db.execute(text("LOCK TABLE carbon_cube_deltas IN EXCLUSIVE MODE"))
+    deltas = db.query(models.CarbonCubeDelta)
+    if start:
+        deltas = deltas.filter(models.CarbonCubeDelta.day >= start)
+    if end:
+        deltas = deltas.filter(models.CarbonCubeDelta.day <= end)
+    deltas.delete(synchronize_session=False)
+    cube = db.query(models.CarbonCube)
+    rollups = db.query(models.CarbonRollup).filter(models.CarbonRollup.period_type == "day")
+    if start:
+        cube = cube.filter(models.CarbonCube.day >= start)
+        rollups = rollups.filter(models.CarbonRollup.period_start >= start)
+    if end:
+        cube = cube.filter(models.CarbonCube.day <= end)
+        rollups = rollups.filter(models.CarbonRollup.period_start <= end)
+    cube.delete(synchronize_session=False)
+    cells: dict = {}
+    sketches: dict = {}
+    for r in rollups.yield_per(1000):
+        key = (r.period_start, r.category or "Other")
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = models.CarbonCube(
+                day=r.period_start, category=key[1],
+                emitted_kg=0.0, saved_kg=0.0, spent=0, record_count=0
+            )
+            sketches[key] = HyperLogLog()
+        cell.emitted_kg += float(r.emitted_kg or 0.0)
+        cell.saved_kg += float(r.saved_kg or 0.0)
+        cell.spent += int(r.spent or 0)
+        cell.record_count += int(r.record_count or 0)
+        sketches[key].add(r.user_id)
+    for key, cell in cells.items():
+        cell.users_sketch = sketches[key].to_bytes()
+        db.add(cell)
+    db.flush()
+    return len(cells)
+
+
+def query(
+    db: Session,
+    start: date,
+    end: date,
+    category: str | None = None,
+    group_by: str = "day"
+) -> list[dict]:
+    """
+    Slices the cube by date range and optional category, grouped
+    by day, category or into a single total. Distinct users are estimated by
+    merging the cell sketches.
+    """
+    q = db.query(models.CarbonCube).filter(models.CarbonCube.day >= start, models.CarbonCube.day <= end)
+    if category:
+        q = q.filter(models.CarbonCube.category == category)
+    groups: dict = {}
+    for cell in q.order_by(models.CarbonCube.day.asc(), models.CarbonCube.category.asc()):
+        if group_by == "day":
+            key = cell.day.isoformat()
+        elif group_by == "category":
+            key = cell.category
+        else:
+            key = "total"
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = {
+                "key": key, "emitted_kg": 0.0, "saved_kg": 0.0, "spent": 0,
+                "transaction_count": 0, "sketch": HyperLogLog()
+            }
+        g["emitted_kg"] += float(cell.emitted_kg or 0.0)
+        g["saved_kg"] += float(cell.saved_kg or 0.0)
+        g["spent"] += int(cell.spent or 0)
+        g["transaction_count"] += int(cell.record_count or 0)
+        if cell.users_sketch:
+            g["sketch"].merge(HyperLogLog(cell.users_sketch))
+    result = []
+    for g in groups.values():
+        sketch = g.pop("sketch")
+        g["emitted_kg"] = round(g["emitted_kg"], 6)
+        g["saved_kg"] = round(g["saved_kg"], 6)
+        g["distinct_users"] = sketch.count()
+        result.append(g)
+    return result
+
+
+def _run():
+    while not _stop.wait(settings.CARBON_CUBE_FOLD_SECONDS):
+        db = SessionLocal()
+        try:
+            fold(db)
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+
+def start():
+    """
+    Starts the background cube folder once per process.
+    """
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="carbon-cube-folder", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
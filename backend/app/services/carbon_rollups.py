@@ -0,0 +1,115 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import date, datetime, timezone
+from .. import models
+from ..database import dialect_insert
+from . import carbon_cube
+
+PERIODS = ("day", "month")
+
+
+def period_start(period_type: str, at: datetime | date) -> date:
+    if isinstance(at, datetime):
+        if at.tzinfo is not None:
+            at = at.astimezone(timezone.utc)
+        day = at.date()
+    else:
+        day = at
+    if period_type == "day":
+        return day
+    if period_type == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown period: {period_type}")
+
+
+def add(db: Session, entries: list[dict]):
+    """
+    Folds carbon activity into the daily and monthly rollups with one upsert,
+    and into the platform-wide cube.
+
+    Each entry has user_id, category, at and any of emitted, saved, spent
+    (paisa) and count. Call in the same DB transaction as the rows it
+    describes.
+    """
+    merged: dict = {}
+    for e in entries:
+        for period_type in PERIODS:
+            key = (e["user_id"], period_type, period_start(period_type, e["at"]), e["category"] or "Other")
+            row = merged.setdefault(key, [0.0, 0.0, 0, 0])
+            row[0] += float(e.get("emitted") or 0.0)
+            row[1] += float(e.get("saved") or 0.0)
+            row[2] += int(e.get("spent") or 0)
+            row[3] += int(e.get("count") or 0)
+    if not merged:
+        return
+    stmt = dialect_insert(db, models.CarbonRollup).values([
+        {
+            "user_id": user_id,
+            "period_type": period_type,
+            "period_start": start,
+            "category": category,
+            "emitted_kg": emitted,
+            "saved_kg": saved,
+            "spent": spent,
+            "record_count": count,
+        }
+        for (user_id, period_type, start, category), (emitted, saved, spent, count) in merged.items()
+    ])
+    rollup = models.CarbonRollup
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "period_type", "period_start", "category"],
+        set_={
+            "emitted_kg": rollup.emitted_kg + stmt.excluded.emitted_kg,
+            "saved_kg": rollup.saved_kg + stmt.excluded.saved_kg,
+            "spent": rollup.spent + stmt.excluded.spent,
+            "record_count": rollup.record_count + stmt.excluded.record_count,
+        }
+    )
+    db.execute(stmt)
+    carbon_cube.add(db, entries, [period_start("day", e["at"]) for e in entries])
+
+
+def record(
+    db: Session,
+    user_id: int,
+    category: str,
+    at: datetime | None,
+    emitted: float = 0.0,
+    saved: float = 0.0,
+    spent: int = 0,
+    count: int = 0
+):
+    add(db, [{
+        "user_id": user_id,
+        "category": category,
+        "at": at or datetime.now(timezone.utc),
+        "emitted": emitted,
+        "saved": saved,
+        "spent": spent,
+        "count": count,
+    }])
+
+
+def month_emission(db: Session, user_id: int, at: datetime | None = None) -> float:
+    start = period_start("month", at or datetime.now(timezone.utc))
+    total = db.query(func.sum(models.CarbonRollup.emitted_kg)).filter(
+        models.CarbonRollup.user_id == user_id,
+        models.CarbonRollup.period_type == "month",
+        models.CarbonRollup.period_start == start
+    ).scalar()
+    return float(total or 0.0)
+
+
+def monthly_breakdown(db: Session, user_id: int) -> list[dict]:
+    rows = db.query(
+        models.CarbonRollup.period_start,
+        func.sum(models.CarbonRollup.emitted_kg).label("total_carbon")
+    ).filter(
+        models.CarbonRollup.user_id == user_id,
+        models.CarbonRollup.period_type == "month"
+    ).group_by(
+        models.CarbonRollup.period_start
+    ).order_by(
+        models.CarbonRollup.period_start.desc()
+    ).all()
+    return [{"month": r.period_start.strftime("%Y-%m"), "total_carbon": float(r.total_carbon or 0.0)} for r in rows]
@@ -1,10 +1,9 @@
 from sqlalchemy.orm import Session
 from .. import models
+from . import emission_factors, carbon_totals, carbon_rollups
 
 def calculate_carbon_saved(db: Session, transaction: models.Transaction):
-    factor = db.query(models.EmissionFactor).filter(models.EmissionFactor.category == transaction.category).first()
-    if not factor:
-        factor = db.query(models.EmissionFactor).filter(models.EmissionFactor.category == "Other").first()
+    factor = emission_factors.resolve(db, transaction.category)
     amount_inr = transaction.amount / 100.0
     actual_emission = amount_inr * (factor.co2_per_unit if factor else 0.0)
     baseline_emission = amount_inr * (factor.baseline_co2_per_unit if factor and factor.baseline_co2_per_unit else 0.0)
@@ -41,9 +40,9 @@ def store_carbon_saving(db: Session, user_id: int, saving: dict):
     db.add(cs)
     db.flush()
     db.refresh(cs)
+    carbon_totals.apply_delta(db, user_id, saved=cs.saved_amount)
+    carbon_rollups.record(db, user_id, record.category, record.created_at, saved=cs.saved_amount)
     return cs
 
 def get_total_savings(db: Session, user_id: int) -> float:
-    from sqlalchemy import func
-    total = db.query(func.sum(models.CarbonSaving.saved_amount)).filter(models.CarbonSaving.user_id == user_id).scalar() or 0.0
-    return float(total)
+    return float(carbon_totals.get_totals(db, user_id).saved_kg or 0.0)
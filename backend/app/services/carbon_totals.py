@@ -0,0 +1,77 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from datetime import datetime
+from .. import models
+from ..database import dialect_insert
+from . import dashboard_snapshot
+
+
+def _backfill(db: Session, user_id: int) -> bool:
+    """
+    Builds the totals row from the user's history. Returns False when another
+    transaction created the row first.
+    """
+    saved = select(func.coalesce(func.sum(models.CarbonSaving.saved_amount), 0.0))\
+        .where(models.CarbonSaving.user_id == user_id).scalar_subquery()
+    emitted = select(func.coalesce(func.sum(models.CarbonRecord.carbon_emission), 0.0))\
+        .where(models.CarbonRecord.user_id == user_id).scalar_subquery()
+    count = select(func.count(models.Transaction.id))\
+        .where(models.Transaction.user_id == user_id).scalar_subquery()
+    spent = select(func.coalesce(func.sum(models.Transaction.amount), 0))\
+        .where(
+            models.Transaction.user_id == user_id,
+            models.Transaction.type == "debit",
+            models.Transaction.status == "completed"
+        ).scalar_subquery()
+    first = select(func.min(models.CarbonRecord.created_at))\
+        .where(models.CarbonRecord.user_id == user_id).scalar_subquery()
+    row = db.execute(select(saved, emitted, count, first, spent)).one()
+    stmt = dialect_insert(db, models.UserCarbonTotals).values(
+        user_id=user_id,
+        saved_kg=float(row[0] or 0.0),
+        emitted_kg=float(row[1] or 0.0),
+        transaction_count=int(row[2] or 0),
+        first_activity_at=row[3],
+        spent=int(row[4] or 0),
+    ).on_conflict_do_nothing(index_elements=["user_id"])
+    return db.execute(stmt).rowcount > 0
+
+
+def get_totals(db: Session, user_id: int) -> models.UserCarbonTotals:
+    totals = db.query(models.UserCarbonTotals).filter(models.UserCarbonTotals.user_id == user_id).first()
+    if not totals:
+        _backfill(db, user_id)
+        totals = db.query(models.UserCarbonTotals).filter(models.UserCarbonTotals.user_id == user_id).first()
+    return totals
+
+
+def apply_delta(
+    db: Session,
+    user_id: int,
+    saved: float = 0.0,
+    emitted: float = 0.0,
+    transactions: int = 0,
+    activity_at: datetime | None = None,
+    spent: int = 0
+):
+    """
+    Adds freshly inserted rows to the user's running totals in the caller's
+    DB transaction. Call after the new rows are flushed: a missing totals row
+    is rebuilt from history, which already includes them.
+    """
+    values = {
+        models.UserCarbonTotals.saved_kg: models.UserCarbonTotals.saved_kg + float(saved or 0.0),
+        models.UserCarbonTotals.emitted_kg: models.UserCarbonTotals.emitted_kg + float(emitted or 0.0),
+        models.UserCarbonTotals.transaction_count: models.UserCarbonTotals.transaction_count + int(transactions or 0),
+        models.UserCarbonTotals.spent: models.UserCarbonTotals.spent + int(spent or 0),
+    }
+    if activity_at is not None:
+        values[models.UserCarbonTotals.first_activity_at] = func.coalesce(models.UserCarbonTotals.first_activity_at, activity_at)
+    updated = db.query(models.UserCarbonTotals)\
+        .filter(models.UserCarbonTotals.user_id == user_id)\
+        .update(values, synchronize_session="fetch")
+    if not updated and not _backfill(db, user_id):
+        db.query(models.UserCarbonTotals)\
+            .filter(models.UserCarbonTotals.user_id == user_id)\
+            .update(values, synchronize_session="fetch")
+    dashboard_snapshot.mark_stale(db, user_id)
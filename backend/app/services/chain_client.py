@@ -0,0 +1,70 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from ..config import settings
+
+DEFAULT_RPC_URL = "https://rpc-amoy.polygon.technology"
+
+_lock = threading.Lock()
+_clients: dict[str, Web3] = {}
+_contracts: dict = {}
+_chain_ids: dict[str, int] = {}
+
+
+def rpc_url() -> str:
+    return settings.CHAIN_RPC_URL or DEFAULT_RPC_URL
+
+
+def _session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.CHAIN_RPC_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_w3(url: str | None = None) -> Web3:
+    """
+    Returns the process-wide Web3 client for an RPC endpoint. Its provider
+    shares one keep-alive requests session, so chain calls reuse pooled
+    connections instead of opening a new one each time.
+    """
+    url = url or rpc_url()
+    w3 = _clients.get(url)
+    if w3 is None:
+        with _lock:
+            w3 = _clients.get(url)
+            if w3 is None:
+                provider = Web3.HTTPProvider(
+                    url,
+                    session=_session(),
+                    request_kwargs={"timeout": (settings.CHAIN_RPC_CONNECT_TIMEOUT_SECONDS, settings.CHAIN_RPC_TIMEOUT_SECONDS)}
+                )
+                w3 = _clients[url] = Web3(provider)
+    return w3
+
+
+def get_contract(address: str, abi: list, url: str | None = None):
+    """
+    Returns a cached contract object. `abi` must be a module-level constant:
+    it is part of the cache key by identity.
+    """
+    w3 = get_w3(url)
+    checksum = Web3.to_checksum_address(address)
+    key = (url or rpc_url(), checksum, id(abi))
+    contract = _contracts.get(key)
+    if contract is None:
+        with _lock:
+            contract = _contracts.get(key)
+            if contract is None:
+                contract = _contracts[key] = w3.eth.contract(address=checksum, abi=abi)
+    return contract
+
+
+def chain_id(url: str | None = None) -> int:
+    url = url or rpc_url()
+    value = _chain_ids.get(url)
+    if value is None:
+        value = _chain_ids[url] = get_w3(url).eth.chain_id
+    return value
@@ -1,7 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, select
 from datetime import datetime, timezone
+from typing import Mapping, NamedTuple, Optional
+import threading
+import time
 from .. import models
+from ..config import settings
+from ..database import dialect_insert
 from . import eco_points
 
 DEFAULT_CHALLENGES = [
@@ -10,63 +15,171 @@ DEFAULT_CHALLENGES = [
     ("POINTS_500", "Earn 500 eco points", "Eco points milestone", "points_earned", 500, 100),
 ]
 
+
+class ChallengeEntry(NamedTuple):
+    id: int
+    code: str
+    name: str
+    description: Optional[str]
+    type: str
+    goal_value: float
+    reward_points: int
+    starts_at: Optional[datetime]
+    ends_at: Optional[datetime]
+
+    def is_open(self, at: datetime) -> bool:
+        if self.starts_at and at < self.starts_at:
+            return False
+        if self.ends_at and at >= self.ends_at:
+            return False
+        return True
+
+
+_lock = threading.Lock()
+_by_type: Mapping[str, tuple[ChallengeEntry, ...]] | None = None
+_active: tuple[ChallengeEntry, ...] = ()
+_loaded_at = 0.0
+
+
+def _aware(value: datetime | None) -> datetime | None:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def refresh(db: Session) -> Mapping[str, tuple[ChallengeEntry, ...]]:
+    """
+    Reloads active challenges into an in-process index keyed by type.
+    Call after anything that writes to the challenges table.
+    """
+    global _by_type, _active, _loaded_at
+    rows = db.query(models.Challenge)\
+        .filter(models.Challenge.active == True)\
+        .order_by(models.Challenge.id.asc())\
+        .all()
+    active = tuple(
+        ChallengeEntry(
+            r.id, r.code, r.name, r.description, r.type,
+            float(r.goal_value or 0.0), int(r.reward_points or 0),
+            _aware(r.starts_at), _aware(r.ends_at)
+        )
+        for r in rows
+    )
+    by_type: dict[str, list[ChallengeEntry]] = {}
+    for entry in active:
+        by_type.setdefault(entry.type, []).append(entry)
+    index = {ctype: tuple(entries) for ctype, entries in by_type.items()}
+    with _lock:
+        _by_type = index
+        _active = active
+        _loaded_at = time.monotonic()
+    return index
+
+
+def invalidate():
+    global _by_type
+    with _lock:
+        _by_type = None
+
+
+def _index(db: Session) -> Mapping[str, tuple[ChallengeEntry, ...]]:
+    index = _by_type
+    ttl = settings.CHALLENGE_CACHE_TTL_SECONDS
+    if index is None or (ttl > 0 and time.monotonic() - _loaded_at > ttl):
+        index = refresh(db)
+    return index
+
+
+def active_challenges(db: Session, ctype: str | None = None, at: datetime | None = None) -> list[ChallengeEntry]:
+    index = _index(db)
+    entries = index.get(ctype, ()) if ctype else _active
+    at = at or datetime.now(timezone.utc)
+    return [c for c in entries if c.is_open(at)]
+
+
 def seed_default_challenges(db: Session):
     for code, name, desc, ctype, goal, reward in DEFAULT_CHALLENGES:
         exists = db.query(models.Challenge).filter(models.Challenge.code == code).first()
         if not exists:
             db.add(models.Challenge(code=code, name=name, description=desc, type=ctype, goal_value=goal, reward_points=reward, active=True))
     db.commit()
+    refresh(db)
+
+
+def _load_progress(db: Session, user_id: int, challenge_ids: list[int]) -> dict:
+    rows = db.execute(
+        select(
+            models.UserChallengeProgress.challenge_id,
+            models.UserChallengeProgress.progress_value,
+            models.UserChallengeProgress.completed,
+            models.UserChallengeProgress.completed_at
+        ).where(
+            models.UserChallengeProgress.user_id == user_id,
+            models.UserChallengeProgress.challenge_id.in_(challenge_ids)
+        )
+    ).all()
+    return {r.challenge_id: r for r in rows}
 
-def _ensure_progress(db: Session, user_id: int, challenge_id: int):
-    prog = db.query(models.UserChallengeProgress).filter(
-        models.UserChallengeProgress.user_id == user_id,
-        models.UserChallengeProgress.challenge_id == challenge_id
-    ).first()
-    if prog:
-        return prog
-    prog = models.UserChallengeProgress(user_id=user_id, challenge_id=challenge_id, progress_value=0.0, completed=False)
-    db.add(prog)
-    db.flush()
-    db.refresh(prog)
-    return prog
-
-def _increment_and_check(db: Session, user_id: int, challenge: models.Challenge, delta: float):
-    prog = _ensure_progress(db, user_id, challenge.id)
-    if prog.completed:
-        return prog
-    prog.progress_value = float(prog.progress_value or 0.0) + float(delta)
-    if prog.progress_value >= float(challenge.goal_value):
-        prog.completed = True
-        prog.completed_at = datetime.now(timezone.utc)
-        eco_points.award_points(db, user_id, int(challenge.reward_points or 0), "BONUS", f"CHALLENGE:{challenge.code}")
-    db.add(prog)
-    db.flush()
-    db.refresh(prog)
-    return prog
-
-def update_on_transaction(db: Session, user_id: int):
-    rows = db.query(models.Challenge).filter(models.Challenge.active == True, models.Challenge.type == "transactions_count").all()
-    for ch in rows:
-        _increment_and_check(db, user_id, ch, 1)
-
-def update_on_saving(db: Session, user_id: int, saved_amount: float):
-    rows = db.query(models.Challenge).filter(models.Challenge.active == True, models.Challenge.type == "carbon_saved").all()
-    for ch in rows:
-        _increment_and_check(db, user_id, ch, float(saved_amount or 0.0))
-
-def update_on_points(db: Session, user_id: int, points: int):
-    rows = db.query(models.Challenge).filter(models.Challenge.active == True, models.Challenge.type == "points_earned").all()
-    for ch in rows:
-        _increment_and_check(db, user_id, ch, int(points or 0))
+
+def _advance(db: Session, user_id: int, ctype: str, delta: float, award=None):
+    """
+    Applies one event to every open challenge of the given type in a single
+    upsert. Progress is incremented in SQL and capped at the goal, so
+    concurrent requests never lose an increment. Rewards go only to the rows
+    this statement moved to completed, so each challenge pays out once.
+    """
+    now = datetime.now(timezone.utc)
+    relevant = active_challenges(db, ctype, now)
+    if not relevant or delta <= 0:
+        return
+    progress = models.UserChallengeProgress
+    stmt = dialect_insert(db, progress).values([
+        {
+            "user_id": user_id,
+            "challenge_id": ch.id,
+            "progress_value": min(float(delta), float(ch.goal_value)),
+            "completed": float(delta) >= ch.goal_value,
+            "completed_at": now if float(delta) >= ch.goal_value else None,
+        }
+        for ch in relevant
+    ])
+    goal = case({ch.id: float(ch.goal_value) for ch in relevant}, value=stmt.excluded.challenge_id)
+    # excluded.progress_value is the delta, already capped at the goal
+    value = func.coalesce(progress.progress_value, 0.0) + stmt.excluded.progress_value
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "challenge_id"],
+        set_={
+            "progress_value": case((value >= goal, goal), else_=value),
+            "completed": value >= goal,
+            "completed_at": case((value >= goal, now), else_=None),
+        },
+        where=progress.completed == False
+    ).returning(progress.challenge_id, progress.completed)
+    flipped = {r.challenge_id for r in db.execute(stmt) if r.completed}
+    for ch in relevant:
+        if ch.id not in flipped:
+            continue
+        if award:
+            award(ch.reward_points, "BONUS", f"CHALLENGE:{ch.code}")
+        else:
+            eco_points.award_points(db, user_id, ch.reward_points, "BONUS", f"CHALLENGE:{ch.code}")
+
+
+def update_on_transaction(db: Session, user_id: int, count: int = 1, award=None):
+    _advance(db, user_id, "transactions_count", count, award)
+
+def update_on_saving(db: Session, user_id: int, saved_amount: float, award=None):
+    _advance(db, user_id, "carbon_saved", float(saved_amount or 0.0), award)
+
+def update_on_points(db: Session, user_id: int, points: int, award=None):
+    _advance(db, user_id, "points_earned", int(points or 0), award)
 
 def get_user_challenges_status(db: Session, user_id: int):
-    challs = db.query(models.Challenge).filter(models.Challenge.active == True).all()
+    challs = active_challenges(db)
+    progress = _load_progress(db, user_id, [c.id for c in challs]) if challs else {}
     result = []
     for ch in challs:
-        prog = db.query(models.UserChallengeProgress).filter(
-            models.UserChallengeProgress.user_id == user_id,
-            models.UserChallengeProgress.challenge_id == ch.id
-        ).first()
+        prog = progress.get(ch.id)
         result.append({
             "id": ch.id,
             "code": ch.code,
@@ -75,8 +188,10 @@ def get_user_challenges_status(db: Session, user_id: int):
             "type": ch.type,
             "goal_value": ch.goal_value,
             "reward_points": ch.reward_points,
-            "progress_value": float(prog.progress_value) if prog else 0.0,
+            "progress_value": float(prog.progress_value or 0.0) if prog else 0.0,
             "completed": bool(prog.completed) if prog else False,
             "completed_at": prog.completed_at if prog else None,
+            "starts_at": ch.starts_at,
+            "ends_at": ch.ends_at,
         })
     return result
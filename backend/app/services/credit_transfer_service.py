@@ -3,19 +3,28 @@ from decimal import Decimal
 from .. import models
 from . import carbon_credit_blockchain_service as cc_chain
 from ..services import logging_service
+from ..config import settings
 
 def transfer_to_company(db: Session, order_id: int) -> dict | None:
+    """
+    Mints (demo mode) or queues the order's credits. The caller commits, in
+    the same transaction as the order's MarketplaceTransaction, so the mint
+    batcher never sees a queued order without it.
+    """
     order = db.query(models.MarketplaceOrder).filter(models.MarketplaceOrder.id == order_id).first()
     if not order or order.status != "COMPLETED":
         return None
     cw = db.query(models.CompanyWallet).filter(models.CompanyWallet.company_id == order.company_id).first()
     if not cw or not cw.wallet_address:
         return None
-    amount_tokens = Decimal(str(order.credit_amount or 0.0))
-    res = cc_chain.mint_carbon_credit(cw.wallet_address, amount_tokens)
+    if settings.ECO_TOKEN_DEMO_MODE:
+        res = cc_chain.mint_carbon_credit(cw.wallet_address, Decimal(str(order.credit_amount or 0.0)))
+    else:
+        # mint_batcher sends queued transfers together in one mintBatch
+        res = {"tx_hash": None, "block_number": None, "status": "queued"}
     order.tx_hash = res.get("tx_hash")
+    order.tx_status = res.get("status")
     db.add(order)
-    db.commit()
-    db.refresh(order)
-    logging_service.log_event(db, "CREDIT_TRANSFER", None, f"order {order.id} tx {order.tx_hash}")
+    db.flush()
+    logging_service.log_event(db, "CREDIT_TRANSFER", None, f"order {order.id} {order.tx_status} {order.tx_hash or ''}")
     return res
@@ -0,0 +1,166 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from datetime import datetime, timezone
+import json
+from .. import models, schemas
+from ..database import dialect_insert
+from . import carbon_totals, carbon_rollups, challenges, user_level, response_cache
+
+
+def mark_stale(db: Session, user_id: int):
+    """
+    Flags the user's dashboard snapshot for a rebuild. Call from every write
+    path that changes what the dashboard shows, inside the same DB transaction.
+    """
+    stmt = dialect_insert(db, models.UserDashboardSnapshot).values(user_id=user_id, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"version": models.UserDashboardSnapshot.version + 1}
+    )
+    db.execute(stmt)
+    response_cache.invalidate_user(db, user_id)
+
+
+def _dump(schema, rows):
+    return [schema.model_validate(r).model_dump(mode="json") for r in rows]
+
+
+def _build_payload(db: Session, user_id: int, now: datetime) -> dict:
+    month_start = carbon_rollups.period_start("month", now)
+    monthly_carbon = select(func.coalesce(func.sum(models.CarbonRollup.emitted_kg), 0.0))\
+        .where(
+            models.CarbonRollup.user_id == user_id,
+            models.CarbonRollup.period_type == "month",
+            models.CarbonRollup.period_start == month_start
+        ).scalar_subquery()
+    # Every one-row-per-user table in a single statement
+    totals, eco_bal, eco_score, user_lvl, streak, wallet_address, monthly_carbon = db.query(
+        models.UserCarbonTotals,
+        models.EcoPointsBalance,
+        models.EcoScore,
+        models.EcoUserLevel,
+        models.EcoStreak,
+        models.UserWallet.address,
+        monthly_carbon,
+    ).select_from(models.User)\
+        .outerjoin(models.UserCarbonTotals, models.UserCarbonTotals.user_id == models.User.id)\
+        .outerjoin(models.EcoPointsBalance, models.EcoPointsBalance.user_id == models.User.id)\
+        .outerjoin(models.EcoScore, models.EcoScore.user_id == models.User.id)\
+        .outerjoin(models.EcoUserLevel, models.EcoUserLevel.user_id == models.User.id)\
+        .outerjoin(models.EcoStreak, models.EcoStreak.user_id == models.User.id)\
+        .outerjoin(models.UserWallet, models.UserWallet.user_id == models.User.id)\
+        .filter(models.User.id == user_id)\
+        .one()
+    if not totals:
+        totals = carbon_totals.get_totals(db, user_id)
+    if not user_lvl:
+        user_lvl = user_level.update_user_level(db, user_id)
+    recent = db.query(models.Transaction)\
+        .filter(models.Transaction.user_id == user_id)\
+        .order_by(models.Transaction.created_at.desc())\
+        .limit(5)\
+        .all()
+    recent_carbon = db.query(models.CarbonRecord)\
+        .filter(models.CarbonRecord.user_id == user_id)\
+        .order_by(models.CarbonRecord.created_at.desc())\
+        .limit(5)\
+        .all()
+    recent_rewards = db.query(models.EcoPointsTransaction)\
+        .filter(models.EcoPointsTransaction.user_id == user_id)\
+        .order_by(models.EcoPointsTransaction.created_at.desc())\
+        .limit(5)\
+        .all()
+    badges_list = db.query(models.Badge).join(models.UserBadge, models.UserBadge.badge_id == models.Badge.id)\
+        .filter(models.UserBadge.user_id == user_id)\
+        .order_by(models.Badge.name.asc())\
+        .limit(20)\
+        .all()
+    first_activity = totals.first_activity_at
+    if first_activity and first_activity.tzinfo is None:
+        first_activity = first_activity.replace(tzinfo=timezone.utc)
+    return {
+        "total_spent": int(totals.spent or 0),
+        "transaction_count": int(totals.transaction_count or 0),
+        "total_carbon": float(totals.emitted_kg or 0.0),
+        "monthly_carbon": float(monthly_carbon or 0.0),
+        "first_activity_at": first_activity.isoformat() if first_activity else None,
+        "total_carbon_saved": float(totals.saved_kg or 0.0),
+        "wallet_address": wallet_address,
+        "recent_transactions": _dump(schemas.TransactionResponse, recent),
+        "recent_carbon_records": _dump(schemas.CarbonRecordResponse, recent_carbon),
+        "eco_points_balance": schemas.EcoPointsBalanceResponse.model_validate(eco_bal).model_dump(mode="json") if eco_bal else None,
+        "eco_score": schemas.EcoScoreResponse.model_validate(eco_score).model_dump(mode="json") if eco_score else {"score": 0.0, "last_updated": None},
+        "recent_rewards": _dump(schemas.EcoPointsTransactionResponse, recent_rewards),
+        "user_level": schemas.EcoUserLevelResponse.model_validate(user_lvl).model_dump(mode="json"),
+        "badges": _dump(schemas.BadgeResponse, badges_list),
+        "streak": schemas.StreakResponse.model_validate(streak).model_dump(mode="json") if streak else None,
+        "challenges": _dump(schemas.ChallengeStatusResponse, challenges.get_user_challenges_status(db, user_id)),
+    }
+
+
+def get_snapshot(db: Session, user_id: int) -> dict:
+    """
+    Returns the user's dashboard payload, rebuilding it only when a write has
+    bumped the version since the last build or the month rolled over.
+    The caller commits so a rebuilt snapshot is persisted.
+    """
+    now = datetime.now(timezone.utc)
+    period = now.strftime("%Y-%m")
+    snap = db.query(models.UserDashboardSnapshot).filter(models.UserDashboardSnapshot.user_id == user_id).first()
+    if snap and snap.payload and snap.built_version == snap.version and snap.period == period:
+        return json.loads(snap.payload)
+    version = snap.version if snap else 0
+    payload = _build_payload(db, user_id, now)
+    encoded = json.dumps(payload)
+    if snap:
+        snap.payload = encoded
+        snap.built_version = version
+        snap.period = period
+        snap.built_at = now
+        db.add(snap)
+        db.flush()
+    else:
+        db.execute(
+            dialect_insert(db, models.UserDashboardSnapshot).values(
+                user_id=user_id,
+                version=0,
+                built_version=0,
+                period=period,
+                payload=encoded,
+                built_at=now
+            ).on_conflict_do_nothing(index_elements=["user_id"])
+        )
+    return payload
+
+
+def summary_fields(payload: dict) -> dict:
+    """
+    Shapes a snapshot payload into the DashboardSummary fields shared by
+    /dashboard/summary and /transactions/summary.
+    """
+    total_carbon = payload["total_carbon"]
+    first_activity = payload["first_activity_at"]
+    if first_activity:
+        days_active = (datetime.now(timezone.utc) - datetime.fromisoformat(first_activity)).days + 1
+        daily_average = total_carbon / days_active
+    else:
+        daily_average = 0.0
+    return {
+        "total_spent": payload["total_spent"],
+        "transaction_count": payload["transaction_count"],
+        "recent_transactions": payload["recent_transactions"],
+        "carbon_summary": {
+            "total_carbon": round(total_carbon, 2),
+            "monthly_carbon": round(payload["monthly_carbon"], 2),
+            "daily_average": round(daily_average, 2)
+        },
+        "recent_carbon_records": payload["recent_carbon_records"],
+        "total_carbon_saved": round(payload["total_carbon_saved"], 2),
+        "eco_points_balance": payload["eco_points_balance"],
+        "eco_score": payload["eco_score"],
+        "recent_rewards": payload["recent_rewards"],
+        "user_level": payload["user_level"],
+        "badges": payload["badges"],
+        "streak": payload["streak"],
+        "challenges": payload["challenges"],
+    }
@@ -2,15 +2,20 @@ from sqlalchemy.orm import Session
 from .. import models
 from . import gamification
 from ..config import settings
-from . import blockchain
+from . import dashboard_snapshot, leaderboard, period_leaderboard
 from sqlalchemy.orm import Session
 from .. import models
 import secrets
 
 DEFAULT_MULTIPLIER = 100
 
-def ensure_balance(db: Session, user_id: int) -> models.EcoPointsBalance:
-    balance = db.query(models.EcoPointsBalance).filter(models.EcoPointsBalance.user_id == user_id).first()
+def ensure_balance(db: Session, user_id: int, for_update: bool = False) -> models.EcoPointsBalance:
+    query = db.query(models.EcoPointsBalance).filter(models.EcoPointsBalance.user_id == user_id)
+    if for_update:
+        # Writers lock the row and re-read it so a concurrent award or
+        # conversion cannot overwrite total_points with a stale value
+        query = query.with_for_update().populate_existing()
+    balance = query.first()
     if not balance:
         balance = models.EcoPointsBalance(user_id=user_id, total_points=0, lifetime_points=0)
         db.add(balance)
@@ -18,58 +23,49 @@ def ensure_balance(db: Session, user_id: int) -> models.EcoPointsBalance:
         db.refresh(balance)
     return balance
 
-def award_points_for_carbon_saving(
-    db: Session,
-    user_id: int,
-    transaction_id: int,
-    carbon_record_id: int,
-    multiplier: int = DEFAULT_MULTIPLIER
-):
-    saving = db.query(models.CarbonSaving).filter(models.CarbonSaving.carbon_record_id == carbon_record_id).first()
-    if not saving or saving.saved_amount is None or saving.saved_amount <= 0:
-        return None
+def _auto_convert_enabled() -> int:
+    if not settings.CHAIN_RPC_URL or not settings.ECO_TOKEN_ADDRESS:
+        return 0
+    return max(int(settings.ECO_TOKEN_AUTO_THRESHOLD or 0), 0)
 
-    points = int(round(saving.saved_amount * multiplier))
+def convert_threshold_multiples(db: Session, balance: models.EcoPointsBalance, wallet_address: str, threshold: int):
+    """
+    Redeems every full threshold multiple of a locked balance in one go and
+    records a single conversion for it. The remainder stays as points.
+    """
+    points = ((balance.total_points or 0) // threshold) * threshold
     if points <= 0:
         return None
+    return convert_points_to_tokens(db, balance.user_id, points, wallet_address)
 
-    balance = ensure_balance(db, user_id)
-    balance.total_points = (balance.total_points or 0) + points
-    balance.lifetime_points = (balance.lifetime_points or 0) + points
-    db.add(balance)
-
-    entry = models.EcoPointsTransaction(
-        user_id=user_id,
-        transaction_id=transaction_id,
-        points=points,
-        action_type="TRANSACTION_REWARD",
-        description="Eco points awarded for carbon savings"
-    )
-    db.add(entry)
-    db.flush()
-    db.refresh(entry)
-    gamification.trigger_on_points_awarded(db, user_id, points)
-    return entry
- 
-def auto_convert_threshold(db: Session, user_id: int):
-    if not settings.CHAIN_RPC_URL or not settings.ECO_TOKEN_ADDRESS:
-        return None
-    wallet = db.query(models.UserWallet).filter(models.UserWallet.user_id == user_id).first()
-    if not wallet or not wallet.address:
-        return None
-    threshold = int(settings.ECO_TOKEN_AUTO_THRESHOLD or 0)
-    if threshold <= 0:
-        return None
-    bal = ensure_balance(db, user_id)
+def auto_convert_due(db: Session, limit: int, user_id: int | None = None) -> list[models.EcoTokenConversion]:
+    """
+    Converts balances that have crossed ECO_TOKEN_AUTO_THRESHOLD, one
+    conversion per user, optionally only for `user_id`. Awards only add
+    points; this runs off the request path from mint_batcher. Balance rows
+    are locked (skipping ones held by an in-flight award or sweep) and
+    re-read under the lock, so a user is never converted twice for the same
+    points however the sweeps and awards interleave.
+    """
+    threshold = _auto_convert_enabled()
+    if not threshold:
+        return []
+    rows = db.query(models.EcoPointsBalance, models.UserWallet.address)\
+        .join(models.UserWallet, models.UserWallet.user_id == models.EcoPointsBalance.user_id)\
+        .filter(models.EcoPointsBalance.total_points >= threshold, models.UserWallet.address.isnot(None))
+    if user_id is not None:
+        rows = rows.filter(models.EcoPointsBalance.user_id == user_id)
+    rows = rows.order_by(models.EcoPointsBalance.id.asc())\
+        .limit(limit)\
+        .with_for_update(of=models.EcoPointsBalance, skip_locked=True)\
+        .populate_existing()\
+        .all()
     converted = []
-    cap = 10
-    while (bal.total_points or 0) >= threshold and cap > 0:
-        conv = convert_points_to_tokens(db, user_id, threshold, wallet.address)
-        if not conv:
-            break
-        converted.append(conv[0])
-        bal = ensure_balance(db, user_id)
-        cap -= 1
+    for balance, address in rows:
+        result = convert_threshold_multiples(db, balance, address, threshold)
+        if result:
+            converted.append(result[0])
+    db.commit()
     return converted
 
 def redeem_points(
@@ -80,7 +76,7 @@ def redeem_points(
 ):
     if points <= 0:
         return None
-    balance = ensure_balance(db, user_id)
+    balance = ensure_balance(db, user_id, for_update=True)
     if (balance.total_points or 0) < points:
         return None
     balance.total_points = (balance.total_points or 0) - points
@@ -93,10 +89,34 @@ def redeem_points(
         description=description
     )
     db.add(entry)
+    dashboard_snapshot.mark_stale(db, user_id)
     db.flush()
     db.refresh(entry)
     return entry
 
+def refund_points(
+    db: Session,
+    user_id: int,
+    points: int,
+    description: str
+):
+    if points <= 0:
+        return None
+    balance = ensure_balance(db, user_id, for_update=True)
+    balance.total_points = (balance.total_points or 0) + points
+    db.add(balance)
+    entry = models.EcoPointsTransaction(
+        user_id=user_id,
+        transaction_id=None,
+        points=points,
+        action_type="REFUND",
+        description=description
+    )
+    db.add(entry)
+    dashboard_snapshot.mark_stale(db, user_id)
+    db.flush()
+    return entry
+
 def convert_points_to_tokens(
     db: Session,
     user_id: int,
@@ -113,15 +133,17 @@ def convert_points_to_tokens(
         return None
     if settings.ECO_TOKEN_DEMO_MODE:
         txh = "0x" + secrets.token_hex(32)
-        res = {"tx_hash": txh, "block_number": 0}
+        res = {"tx_hash": txh, "block_number": 0, "status": "confirmed"}
     else:
-        res = blockchain.mint(wallet_address, wei)
+        # mint_batcher sends queued conversions together in one mintBatch
+        res = {"tx_hash": None, "block_number": None, "status": "queued"}
     conv = models.EcoTokenConversion(
         user_id=user_id,
         points=points,
         token_amount=tokens,
         tx_hash=res["tx_hash"],
-        status="minted"
+        wallet_address=wallet_address,
+        status=res["status"]
     )
     db.add(conv)
     db.flush()
@@ -147,10 +169,12 @@ def award_points(
 ):
     if points <= 0:
         return None
-    balance = ensure_balance(db, user_id)
+    balance = ensure_balance(db, user_id, for_update=True)
     balance.total_points = (balance.total_points or 0) + points
     balance.lifetime_points = (balance.lifetime_points or 0) + points
     db.add(balance)
+    leaderboard.record(db, user_id, balance.lifetime_points)
+    period_leaderboard.add_points(db, user_id, points)
     entry = models.EcoPointsTransaction(
         user_id=user_id,
         transaction_id=transaction_id,
@@ -159,8 +183,8 @@ def award_points(
         description=description
     )
     db.add(entry)
+    dashboard_snapshot.mark_stale(db, user_id)
     db.flush()
     db.refresh(entry)
     gamification.trigger_on_points_awarded(db, user_id, points)
-    auto_convert_threshold(db, user_id)
     return entry
@@ -0,0 +1,59 @@
+from sqlalchemy.orm import Session
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+import threading
+import time
+from .. import models
+from ..config import settings
+
+DEFAULT_CATEGORY = "Other"
+
+
+class FactorEntry(NamedTuple):
+    id: int
+    category: str
+    co2_per_unit: float
+    baseline_co2_per_unit: Optional[float]
+    unit: str
+    description: Optional[str]
+
+
+_lock = threading.Lock()
+_factors: Mapping[str, FactorEntry] | None = None
+_loaded_at = 0.0
+
+
+def refresh(db: Session) -> Mapping[str, FactorEntry]:
+    """
+    Reloads the emission factor table into an immutable in-process map.
+    Call after anything that writes to emission_factors.
+    """
+    global _factors, _loaded_at
+    rows = db.query(models.EmissionFactor).order_by(models.EmissionFactor.id.asc()).all()
+    snapshot = MappingProxyType({
+        r.category: FactorEntry(r.id, r.category, r.co2_per_unit, r.baseline_co2_per_unit, r.unit, r.description)
+        for r in rows
+    })
+    with _lock:
+        _factors = snapshot
+        _loaded_at = time.monotonic()
+    return snapshot
+
+
+def invalidate():
+    global _factors
+    with _lock:
+        _factors = None
+
+
+def get_factors(db: Session) -> Mapping[str, FactorEntry]:
+    factors = _factors
+    ttl = settings.EMISSION_FACTOR_CACHE_TTL_SECONDS
+    if factors is None or (ttl > 0 and time.monotonic() - _loaded_at > ttl):
+        factors = refresh(db)
+    return factors
+
+
+def resolve(db: Session, category: str) -> FactorEntry | None:
+    factors = get_factors(db)
+    return factors.get(category) or factors.get(DEFAULT_CATEGORY)
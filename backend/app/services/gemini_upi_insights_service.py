@@ -90,7 +90,11 @@ def _call_gemini(prompt: str) -> str | None:
         return None
 
 
-def analyze_transaction(db: Session, transaction_id: str, user_id: int | None = None) -> str:
+def build_prompt(db: Session, transaction_id: str) -> tuple[str, str]:
+    """
+    Does all the DB work for an insight: returns the Gemini prompt and the
+    text to fall back on when Gemini is unavailable.
+    """
     upi_tx = (
         db.query(models.UpiTransaction)
         .filter(models.UpiTransaction.transaction_id == transaction_id)
@@ -125,16 +129,21 @@ def analyze_transaction(db: Session, transaction_id: str, user_id: int | None =
         "Respond in one or two short sentences, plain text only.\n\n"
         f"Transaction summary:\n{json.dumps(summary, ensure_ascii=False)}"
     )
-    ai_text = _call_gemini(base_prompt)
-    if ai_text:
-        return ai_text.strip()
     if carbon_kg is not None:
-        return (
+        fallback = (
             f"This UPI payment is estimated to have generated {carbon_kg:.2f} kg CO2. "
             "Choosing lower-carbon products, services, or transport options could cut this footprint significantly."
         )
-    return (
-        f"This UPI payment of ₹{amount_inr:.2f} has an associated carbon footprint based on what was purchased. "
-        "Prefer eco-labelled products, public or shared transport, and lower-impact services to reduce future emissions."
-    )
+    else:
+        fallback = (
+            f"This UPI payment of ₹{amount_inr:.2f} has an associated carbon footprint based on what was purchased. "
+            "Prefer eco-labelled products, public or shared transport, and lower-impact services to reduce future emissions."
+        )
+    return base_prompt, fallback
 
+
+def generate_insight(prompt: str, fallback: str) -> str:
+    ai_text = _call_gemini(prompt)
+    if ai_text:
+        return ai_text.strip()
+    return fallback
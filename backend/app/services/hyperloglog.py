@@ -0,0 +1,45 @@
+import hashlib
+import math
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION # ~1.6% standard error
+
+
+def _position(value) -> tuple[int, int]:
+    h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+    index = h >> (64 - PRECISION)
+    rest = h & ((1 << (64 - PRECISION)) - 1)
+    rank = (64 - PRECISION) - rest.bit_length() + 1
+    return index, rank
+
+
+class HyperLogLog:
+    """
+    Mergeable distinct-count sketch stored as one byte per register.
+    """
+
+    def __init__(self, registers: bytes | None = None):
+        self.registers = bytearray(registers) if registers else bytearray(REGISTERS)
+
+    def add(self, value) -> bool:
+        index, rank = _position(value)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        m = REGISTERS
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
@@ -0,0 +1,113 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from bisect import bisect_left, insort
+import threading
+import time
+from .. import models
+from ..config import settings
+
+_PENDING_KEY = "leaderboard_pending"
+
+_lock = threading.Lock()
+_board: list[tuple[int, int]] = [] # Sorted (-lifetime_points, user_id)
+_points: dict[int, int] = {}
+_loaded_at: float | None = None
+
+
+def load(db: Session):
+    """
+    Rebuilds the in-process board from eco_points_balances. Runs on first use
+    and again every LEADERBOARD_RELOAD_SECONDS to pick up writes made by
+    other processes.
+    """
+    global _board, _points, _loaded_at
+    rows = db.query(models.EcoPointsBalance.user_id, models.EcoPointsBalance.lifetime_points).all()
+    points = {user_id: int(lifetime or 0) for user_id, lifetime in rows}
+    board = sorted((-p, user_id) for user_id, p in points.items())
+    with _lock:
+        _board = board
+        _points = points
+        _loaded_at = time.monotonic()
+
+
+def _ensure_loaded(db: Session):
+    ttl = settings.LEADERBOARD_RELOAD_SECONDS
+    if _loaded_at is None or (ttl > 0 and time.monotonic() - _loaded_at > ttl):
+        load(db)
+
+
+def _apply(user_id: int, lifetime_points: int):
+    with _lock:
+        old = _points.get(user_id)
+        if old is not None:
+            i = bisect_left(_board, (-old, user_id))
+            if i < len(_board) and _board[i] == (-old, user_id):
+                del _board[i]
+        _points[user_id] = lifetime_points
+        insort(_board, (-lifetime_points, user_id))
+
+
+def record(db: Session, user_id: int, lifetime_points: int):
+    """
+    Queues the user's new lifetime points; the board is updated once the
+    caller's DB transaction commits.
+    """
+    db.info.setdefault(_PENDING_KEY, {})[user_id] = int(lifetime_points or 0)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending and _loaded_at is not None:
+        for user_id, lifetime_points in pending.items():
+            _apply(user_id, lifetime_points)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def top(db: Session, limit: int = 10, offset: int = 0) -> list[dict]:
+    _ensure_loaded(db)
+    with _lock:
+        page = _board[offset:offset + limit]
+    if not page:
+        return []
+    ids = [user_id for _, user_id in page]
+    rows = db.query(models.User, models.EcoUserLevel)\
+        .outerjoin(models.EcoUserLevel, models.EcoUserLevel.user_id == models.User.id)\
+        .filter(models.User.id.in_(ids))\
+        .all()
+    by_id = {user.id: (user, lvl) for user, lvl in rows}
+    result = []
+    for neg_points, user_id in page:
+        if user_id not in by_id:
+            continue
+        user, lvl = by_id[user_id]
+        result.append({
+            "user_id": user.id,
+            "full_name": user.full_name,
+            "email": user.email,
+            "lifetime_points": -neg_points,
+            "level": lvl.level if lvl else "Beginner"
+        })
+    return result
+
+
+def rank(db: Session, user_id: int) -> dict:
+    """
+    Returns the user's 1-based rank: one more than the number of users with
+    strictly more lifetime points.
+    """
+    _ensure_loaded(db)
+    with _lock:
+        points = _points.get(user_id, 0)
+        position = bisect_left(_board, (-points, 0)) + 1
+        total = len(_board)
+    return {
+        "user_id": user_id,
+        "lifetime_points": points,
+        "rank": position,
+        "total_users": max(total, position)
+    }
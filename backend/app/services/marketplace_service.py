@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from .. import models
 from ..config import settings
+from . import carbon_totals, carbon_rollups
 
 
 def create_listing(db: Session, seller_user_id: int, credit_id: int, credit_amount: float, price_per_credit: float):
@@ -67,6 +68,8 @@ def _ensure_demo_saving(db: Session, user_id: int, saved_amount_kg: float) -> mo
     db.add(saving)
     db.flush()
     db.refresh(saving)
+    carbon_totals.apply_delta(db, user_id, saved=saved_amount_kg, activity_at=carbon_record.created_at)
+    carbon_rollups.record(db, user_id, carbon_record.category, carbon_record.created_at, saved=saved_amount_kg, count=1)
     return saving
 
 
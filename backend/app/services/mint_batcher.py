@@ -0,0 +1,262 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+from .. import models
+from ..config import settings
+from ..database import SessionLocal
+from . import blockchain, carbon_credit_blockchain_service as cc_chain, chain_client, eco_points, logging_service
+
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def _set_status(db: Session, model, column, ids: list[int], status: str):
+    db.query(model).filter(model.id.in_(ids)).update({column: status}, synchronize_session=False)
+    db.commit()
+
+
+def _claim(db: Session, model, column, ids: list[int]):
+    db.query(model).filter(model.id.in_(ids)).update(
+        {column: "sending", model.sent_at: datetime.now(timezone.utc), model.tx_hash: None, model.tx_nonce: None},
+        synchronize_session=False
+    )
+    db.commit()
+
+
+def _send_claimed(db: Session, model, column, ids: list[int], mint) -> None:
+    """
+    Runs `mint(on_signed)` for rows already claimed as sending. The signed
+    hash and nonce are committed before the broadcast, so after an error the
+    rows are only requeued when nothing was signed; otherwise they stay
+    sending with their hash for reconcile_sending to settle.
+    """
+    signed = []
+
+    def record(tx_hash: str, nonce: int):
+        db.query(model).filter(model.id.in_(ids))\
+            .update({model.tx_hash: tx_hash, model.tx_nonce: nonce}, synchronize_session=False)
+        db.commit()
+        signed.append(tx_hash)
+
+    try:
+        tx_hash = mint(record)
+    except Exception:
+        db.rollback()
+        if not signed:
+            _set_status(db, model, column, ids, "queued")
+        raise
+    db.query(model).filter(model.id.in_(ids))\
+        .update({model.tx_hash: tx_hash, column: "pending"}, synchronize_session=False)
+    if model is models.MarketplaceOrder:
+        db.query(models.MarketplaceTransaction)\
+            .filter(models.MarketplaceTransaction.order_id.in_(ids))\
+            .update({models.MarketplaceTransaction.blockchain_tx_hash: tx_hash}, synchronize_session=False)
+    db.commit()
+
+
+def _flush_conversions(db: Session) -> int:
+    conversion = models.EcoTokenConversion
+    rows = db.query(conversion)\
+        .filter(conversion.status == "queued")\
+        .order_by(conversion.id.asc())\
+        .limit(settings.MINT_BATCH_SIZE)\
+        .with_for_update(skip_locked=True)\
+        .all()
+    if not rows:
+        return 0
+    # A bad address would fail the whole batch on every flush: fail just the row
+    valid = []
+    for r in rows:
+        if Web3.is_address(r.wallet_address or ""):
+            valid.append(r)
+            continue
+        r.status = "failed"
+        db.add(r)
+        eco_points.refund_points(db, r.user_id, r.points, f"ECO token mint failed: invalid wallet {r.wallet_address}")
+        logging_service.log_event(db, "MINT_INVALID_ADDRESS", r.user_id, f"conversion {r.id} {r.wallet_address}")
+    ids = [r.id for r in valid]
+    # One mint per wallet, however many conversions it has queued
+    amounts: dict[str, int] = {}
+    for r in valid:
+        amounts[r.wallet_address] = amounts.get(r.wallet_address, 0) + int(r.token_amount * (10**18))
+    if not ids:
+        db.commit()
+        return 0
+    # Claim the rows and release their locks before talking to the chain
+    _claim(db, conversion, conversion.status, ids)
+    _send_claimed(db, conversion, conversion.status, ids,
+                  lambda on_signed: blockchain.mint_batch(list(amounts), list(amounts.values()), on_signed=on_signed))
+    return len(ids)
+
+
+def _flush_orders(db: Session) -> int:
+    order = models.MarketplaceOrder
+    rows = db.query(order.id, order.credit_amount, models.CompanyWallet.wallet_address)\
+        .join(models.CompanyWallet, models.CompanyWallet.company_id == order.company_id)\
+        .filter(order.tx_status == "queued")\
+        .order_by(order.id.asc())\
+        .limit(settings.MINT_BATCH_SIZE)\
+        .with_for_update(of=order, skip_locked=True)\
+        .all()
+    if not rows:
+        return 0
+    valid = []
+    invalid = []
+    for r in rows:
+        if Web3.is_address(r.wallet_address or ""):
+            valid.append(r)
+            continue
+        invalid.append(r.id)
+        logging_service.log_event(db, "MINT_INVALID_ADDRESS", None, f"order {r.id} {r.wallet_address}")
+    if invalid:
+        db.query(order).filter(order.id.in_(invalid)).update({order.tx_status: "failed"}, synchronize_session=False)
+    ids = [r.id for r in valid]
+    if not ids:
+        db.commit()
+        return 0
+    _claim(db, order, order.tx_status, ids)
+    _send_claimed(db, order, order.tx_status, ids, lambda on_signed: cc_chain.mint_credit_batch(
+        [r.wallet_address for r in valid],
+        [Decimal(str(r.credit_amount or 0.0)) for r in valid],
+        on_signed=on_signed
+    ))
+    return len(ids)
+
+
+def _reconcile(db: Session, model, column, owner_address) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.MINT_SENDING_TIMEOUT_SECONDS)
+    stale = db.query(model.tx_hash, model.tx_nonce)\
+        .filter(column == "sending", model.sent_at < cutoff)\
+        .distinct()\
+        .all()
+    db.rollback()
+    if not stale:
+        return 0
+    w3 = chain_client.get_w3()
+    mined_nonce = None
+    moved = 0
+    for tx_hash, nonce in stale:
+        if tx_hash is None:
+            status = "queued"
+        else:
+            try:
+                w3.eth.get_transaction(tx_hash)
+                status = "pending"
+            except TransactionNotFound:
+                if mined_nonce is None:
+                    mined_nonce = w3.eth.get_transaction_count(owner_address(), "latest")
+                # Another transaction used the nonce, so this one can never be mined
+                status = "queued" if nonce is not None and mined_nonce > nonce else None
+        if status is None:
+            continue
+        values = {column: status}
+        if status == "queued":
+            values.update({model.tx_hash: None, model.tx_nonce: None})
+        rows = db.query(model.id)\
+            .filter(column == "sending", model.sent_at < cutoff,
+                    model.tx_hash.is_(None) if tx_hash is None else model.tx_hash == tx_hash)\
+            .with_for_update(skip_locked=True)\
+            .all()
+        ids = [r.id for r in rows]
+        if not ids:
+            continue
+        db.query(model).filter(model.id.in_(ids)).update(values, synchronize_session=False)
+        if model is models.MarketplaceOrder and status == "pending":
+            db.query(models.MarketplaceTransaction)\
+                .filter(models.MarketplaceTransaction.order_id.in_(ids))\
+                .update({models.MarketplaceTransaction.blockchain_tx_hash: tx_hash}, synchronize_session=False)
+        moved += len(ids)
+    db.commit()
+    return moved
+
+
+def reconcile_sending(db: Session) -> int:
+    """
+    Settles rows left in sending for MINT_SENDING_TIMEOUT_SECONDS, e.g. after
+    a crash or a broadcast error. Rows whose tx reached the node move to
+    pending for receipt_tracker; rows that were never signed, or whose nonce
+    was since used by another tx, go back to the queue. Anything else may
+    still be mined and is left for a later pass.
+    """
+    return _reconcile(db, models.EcoTokenConversion, models.EcoTokenConversion.status, blockchain.owner_address)\
+        + _reconcile(db, models.MarketplaceOrder, models.MarketplaceOrder.tx_status, cc_chain.owner_address)
+
+
+def queued(db: Session) -> int:
+    conversions = db.query(func.count(models.EcoTokenConversion.id))\
+        .filter(models.EcoTokenConversion.status == "queued").scalar() or 0
+    orders = db.query(func.count(models.MarketplaceOrder.id))\
+        .filter(models.MarketplaceOrder.tx_status == "queued").scalar() or 0
+    return max(conversions, orders)
+
+
+def flush(db: Session) -> dict:
+    """
+    Converts balances that crossed the auto-convert threshold, then sends
+    up to MINT_BATCH_SIZE queued ECO conversions and up to
+    MINT_BATCH_SIZE queued carbon credit transfers, each as one mintBatch
+    transaction. Rows are claimed as sending and committed before the RPC,
+    so no row locks are held while the chain responds. Every row in a batch
+    then gets the batch's tx hash and moves to pending; receipt_tracker
+    settles them together since the batch mints all recipients or none. A
+    send that fails before signing puts the rows back in the queue; see
+    reconcile_sending for rows whose tx was signed. Rows with an invalid
+    recipient address are failed on their own.
+    """
+    sent = {}
+    steps = (
+        ("reconciled", reconcile_sending),
+        ("auto_conversions", lambda db: len(eco_points.auto_convert_due(db, settings.MINT_BATCH_SIZE))),
+        ("eco_conversions", _flush_conversions),
+        ("credit_orders", _flush_orders),
+    )
+    for name, step in steps:
+        try:
+            sent[name] = step(db)
+        except Exception as e:
+            db.rollback()
+            logging_service.log_event(db, "MINT_BATCH_FAILED", None, f"{name}: {e}")
+            db.commit()
+            sent[name] = 0
+    return sent
+
+
+def _run():
+    last_flush = time.monotonic()
+    tick = min(1.0, settings.MINT_BATCH_WINDOW_SECONDS)
+    while not _stop.wait(tick):
+        db = SessionLocal()
+        try:
+            due = time.monotonic() - last_flush >= settings.MINT_BATCH_WINDOW_SECONDS
+            if due or queued(db) >= settings.MINT_BATCH_SIZE:
+                flush(db)
+                last_flush = time.monotonic()
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+
+def start():
+    """
+    Starts the background batcher once per process: a batch goes out when
+    MINT_BATCH_SIZE mints are queued or MINT_BATCH_WINDOW_SECONDS after the
+    previous flush, whichever comes first.
+    """
+    global _thread
+    if not settings.CHAIN_RPC_URL:
+        return
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="mint-batcher", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
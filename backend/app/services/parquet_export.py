@@ -0,0 +1,142 @@
+import os
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from sqlalchemy import select, types
+from sqlalchemy.orm import Session
+from .. import models
+from ..config import settings
+from ..database import SessionLocal
+
+TABLES = {
+    "transactions": models.Transaction,
+    "carbon_records": models.CarbonRecord,
+    "carbon_savings": models.CarbonSaving,
+    "eco_points_transactions": models.EcoPointsTransaction,
+    "upi_transactions": models.UpiTransaction,
+}
+
+_lock = threading.Lock()
+_status: dict = {"running": False, "started_at": None, "finished_at": None, "tables": {}, "error": None}
+
+
+def _arrow_type(pa, column):
+    t = column.type
+    if isinstance(t, types.Boolean):
+        return pa.bool_()
+    if isinstance(t, types.Integer):
+        return pa.int64()
+    if isinstance(t, (types.Float, types.Numeric)):
+        return pa.float64()
+    if isinstance(t, types.DateTime):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(t, types.Date):
+        return pa.date32()
+    if isinstance(t, types.LargeBinary):
+        return pa.binary()
+    return pa.string()
+
+
+def _value(value):
+    # SQLite hands back naive datetimes; everything is stored as UTC
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _month(value) -> str:
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m")
+    return "unknown"
+
+
+def _checkpoint(db: Session, name: str) -> models.AnalyticsExportCheckpoint:
+    cp = db.query(models.AnalyticsExportCheckpoint).filter(models.AnalyticsExportCheckpoint.table_name == name).first()
+    if not cp:
+        cp = models.AnalyticsExportCheckpoint(table_name=name, last_id=0, exported_rows=0)
+        db.add(cp)
+        db.flush()
+    return cp
+
+
+def export_table(db: Session, name: str, out_dir: str, batch_size: int) -> int:
+    """
+    Appends rows with an id above the table's checkpoint to
+    <out_dir>/<table>/month=YYYY-MM/part-<first>-<last>.parquet, reading
+    keyset batches ordered by id. The checkpoint is committed after each
+    batch's files are written, so an interrupted export resumes where it
+    stopped. Rows updated after they were exported are not re-exported.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    model = TABLES[name]
+    table = model.__table__
+    columns = list(table.columns)
+    schema = pa.schema([pa.field(c.name, _arrow_type(pa, c)) for c in columns])
+    cp = _checkpoint(db, name)
+    db.commit()
+    written = 0
+    _status["tables"][name] = {"last_id": cp.last_id, "written": 0}
+    while True:
+        rows = db.execute(
+            select(table).where(table.c.id > cp.last_id).order_by(table.c.id.asc()).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        by_month: dict = {}
+        for row in rows:
+            by_month.setdefault(_month(row.created_at), []).append(row)
+        for month, chunk in by_month.items():
+            data = {c.name: [_value(r[i]) for r in chunk] for i, c in enumerate(columns)}
+            path = os.path.join(out_dir, name, f"month={month}")
+            os.makedirs(path, exist_ok=True)
+            filename = f"part-{chunk[0].id:012d}-{chunk[-1].id:012d}.parquet"
+            tmp = os.path.join(path, f".{filename}.{uuid.uuid4().hex}.tmp")
+            pq.write_table(pa.Table.from_pydict(data, schema=schema), tmp)
+            os.replace(tmp, os.path.join(path, filename))
+        cp.last_id = rows[-1].id
+        cp.exported_rows = (cp.exported_rows or 0) + len(rows)
+        db.add(cp)
+        db.commit()
+        written += len(rows)
+        _status["tables"][name] = {"last_id": cp.last_id, "written": written}
+        if len(rows) < batch_size:
+            break
+    return written
+
+
+def run(tables: list[str] | None = None, out_dir: str | None = None, batch_size: int | None = None) -> dict:
+    """
+    Runs one incremental export of the given tables (all by default) on its
+    own session. Meant for a background task or a scheduler, not a request.
+    Returns immediately if an export is already running.
+    """
+    if not _lock.acquire(blocking=False):
+        return status()
+    out_dir = out_dir or settings.ANALYTICS_EXPORT_DIR
+    batch_size = batch_size or settings.ANALYTICS_EXPORT_BATCH_SIZE
+    _status.update(running=True, started_at=datetime.now(timezone.utc), finished_at=None, tables={}, error=None)
+    db = SessionLocal()
+    try:
+        for name in tables or list(TABLES):
+            export_table(db, name, out_dir, batch_size)
+    except Exception as e:
+        db.rollback()
+        _status["error"] = str(e)
+    finally:
+        db.close()
+        _status.update(running=False, finished_at=datetime.now(timezone.utc))
+        _lock.release()
+    return status()
+
+
+def status() -> dict:
+    return {**_status, "tables": dict(_status["tables"])}
+
+
+def checkpoints(db: Session) -> list[dict]:
+    return [
+        {"table": cp.table_name, "last_id": cp.last_id, "exported_rows": cp.exported_rows, "updated_at": cp.updated_at}
+        for cp in db.query(models.AnalyticsExportCheckpoint).order_by(models.AnalyticsExportCheckpoint.table_name.asc())
+    ]
@@ -1,7 +1,7 @@
 from sqlalchemy.orm import Session
 import uuid
 from .. import models, schemas
-from . import upi_service, carbon, eco_points, reward_rules, badges
+from . import upi_service, carbon, reward_orchestrator
 
 
 def create_order_by_category(
@@ -112,25 +112,11 @@ def verify_and_process_payment(
         transaction_id=transaction.id,
         amount=transaction.amount,
         category=carbon_category,
+        spent=transaction.amount,
     )
-    eco_points.award_points_for_carbon_saving(
-        db=db,
-        user_id=transaction.user_id,
-        transaction_id=transaction.id,
-        carbon_record_id=carbon_record.id,
-    )
-    reward_rules.apply_rules_for_transaction(
-        db=db,
-        user_id=transaction.user_id,
-        transaction_id=transaction.id,
-        carbon_record_id=carbon_record.id,
-    )
-    badges.award_badges_for_transaction(
-        db=db,
-        user_id=transaction.user_id,
-        transaction_id=transaction.id,
-        carbon_record_id=carbon_record.id,
-    )
+    rewards = reward_orchestrator.RewardContext(db, transaction.user_id)
+    rewards.record_carbon(transaction.id, carbon_record)
+    rewards.finish()
     db.commit()
     db.refresh(transaction)
     return transaction
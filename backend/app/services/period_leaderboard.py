@@ -0,0 +1,67 @@
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta, timezone
+from .. import models
+from ..database import dialect_insert
+
+PERIODS = ("week", "month")
+
+
+def period_start(period_type: str, at: datetime | None = None) -> date:
+    """
+    Start of the UTC week (Monday) or month containing `at`. New periods get
+    fresh buckets, so the boards roll over without a reset job.
+    """
+    day = (at or datetime.now(timezone.utc)).astimezone(timezone.utc).date()
+    if period_type == "week":
+        return day - timedelta(days=day.weekday())
+    if period_type == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown period: {period_type}")
+
+
+def add_points(db: Session, user_id: int, points: int, at: datetime | None = None):
+    """
+    Adds awarded points to the user's current weekly and monthly buckets in
+    the caller's DB transaction.
+    """
+    if points <= 0:
+        return
+    for period_type in PERIODS:
+        stmt = dialect_insert(db, models.EcoPointsPeriodBucket).values(
+            user_id=user_id,
+            period_type=period_type,
+            period_start=period_start(period_type, at),
+            points=points
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["period_type", "period_start", "user_id"],
+            set_={"points": models.EcoPointsPeriodBucket.points + stmt.excluded.points}
+        )
+        db.execute(stmt)
+
+
+def top(db: Session, period_type: str, limit: int = 10, offset: int = 0) -> list[dict]:
+    start = period_start(period_type)
+    rows = db.query(models.EcoPointsPeriodBucket, models.User, models.EcoUserLevel, models.EcoPointsBalance.lifetime_points)\
+        .join(models.User, models.User.id == models.EcoPointsPeriodBucket.user_id)\
+        .outerjoin(models.EcoPointsBalance, models.EcoPointsBalance.user_id == models.User.id)\
+        .outerjoin(models.EcoUserLevel, models.EcoUserLevel.user_id == models.User.id)\
+        .filter(
+            models.EcoPointsPeriodBucket.period_type == period_type,
+            models.EcoPointsPeriodBucket.period_start == start
+        )\
+        .order_by(models.EcoPointsPeriodBucket.points.desc(), models.EcoPointsPeriodBucket.user_id.asc())\
+        .offset(offset)\
+        .limit(limit)\
+        .all()
+    return [
+        {
+            "user_id": user.id,
+            "full_name": user.full_name,
+            "email": user.email,
+            "lifetime_points": lifetime or 0,
+            "period_points": bucket.points or 0,
+            "level": lvl.level if lvl else "Beginner"
+        }
+        for bucket, user, lvl, lifetime in rows
+    ]
@@ -0,0 +1,176 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from web3.exceptions import TransactionNotFound
+from .. import models
+from ..config import settings
+from ..database import SessionLocal
+from . import balance_cache, blockchain, carbon_credit_blockchain_service as cc_chain, chain_client, eco_points, logging_service, response_cache, tx_sender
+
+BATCH_SIZE = 100
+
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_after: dict = {}
+
+
+def _receipt_status(w3, tx_hash: str) -> str | None:
+    try:
+        receipt = w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        return None
+    return "confirmed" if receipt["status"] == 1 else "failed"
+
+
+def _settle(db: Session, model, column, row_id: int, values: dict) -> bool:
+    # Only the poller that moves the row out of pending acts on the outcome,
+    # so trackers in several workers never refund the same conversion twice
+    moved = db.query(model)\
+        .filter(model.id == row_id, column == "pending")\
+        .update(values, synchronize_session=False)
+    return moved == 1
+
+
+def _page(db: Session, model, column) -> list:
+    # Walks the pending rows in id order across polls so rows that stay
+    # unresolved cannot starve newer mints
+    after = _after.get(model.__tablename__, 0)
+    rows = db.query(model)\
+        .filter(column == "pending", model.id > after)\
+        .order_by(model.id.asc())\
+        .limit(BATCH_SIZE)\
+        .all()
+    _after[model.__tablename__] = rows[-1].id if len(rows) == BATCH_SIZE else 0
+    return rows
+
+
+def _is_overdue(row, cutoff: datetime) -> bool:
+    at = row.sent_at or row.created_at
+    if at is None:
+        return False
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return at < cutoff
+
+
+def _dropped_outcome(w3, row, owner_address, mined: dict) -> str | None:
+    """
+    Decides what to do with a tx that has had no receipt for
+    CHAIN_PENDING_TIMEOUT_SECONDS. A tx the node still holds keeps waiting.
+    Once another tx has used its nonce it can never be mined, so the row is
+    minted again. Legacy rows without a nonce are failed. A nonce that is
+    still free resets the local counter so the next batch fills the gap.
+    """
+    try:
+        w3.eth.get_transaction(row.tx_hash)
+        return None
+    except TransactionNotFound:
+        pass
+    if row.tx_nonce is None:
+        return "failed"
+    address = owner_address()
+    if address not in mined:
+        mined[address] = w3.eth.get_transaction_count(address, "latest")
+    if mined[address] > row.tx_nonce:
+        return "requeue"
+    tx_sender.reset(address)
+    return None
+
+
+def poll(db: Session) -> dict:
+    """
+    Checks receipts for pending ECO token conversions and carbon credit
+    mints and records the outcome. A failed conversion gives the user their
+    points back; a failed order is minted again up to MINT_MAX_ATTEMPTS
+    times, then failed and logged for a manual refund. Dropped transactions
+    are requeued after CHAIN_PENDING_TIMEOUT_SECONDS. Returns how many rows
+    moved to each state.
+    """
+    w3 = chain_client.get_w3()
+    counts = {"confirmed": 0, "failed": 0, "requeued": 0}
+    minted = []
+    conversion, order = models.EcoTokenConversion, models.MarketplaceOrder
+    conversions = _page(db, conversion, conversion.status)
+    orders = _page(db, order, order.tx_status)
+    # Batched mints share one tx hash: fetch each receipt once, and all of
+    # them before the first write so no lock is held across an RPC
+    outcomes = {h: _receipt_status(w3, h) for h in {r.tx_hash for r in conversions} | {o.tx_hash for o in orders}}
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.CHAIN_PENDING_TIMEOUT_SECONDS)
+    mined: dict = {}
+
+    def outcome_of(row, owner_address):
+        outcome = outcomes[row.tx_hash]
+        if outcome is None and _is_overdue(row, cutoff):
+            outcome = _dropped_outcome(w3, row, owner_address, mined)
+        return outcome
+
+    requeue = {"tx_hash": None, "tx_nonce": None, "sent_at": None}
+    for conv in conversions:
+        outcome = outcome_of(conv, blockchain.owner_address)
+        if outcome is None:
+            continue
+        if outcome == "requeue":
+            if _settle(db, conversion, conversion.status, conv.id, {**requeue, "status": "queued"}):
+                counts["requeued"] += 1
+            continue
+        if not _settle(db, conversion, conversion.status, conv.id, {"status": outcome}):
+            continue
+        if outcome == "failed":
+            eco_points.refund_points(db, conv.user_id, conv.points, f"ECO token mint failed {conv.tx_hash}")
+        else:
+            minted.append(("eco", conv.wallet_address))
+            response_cache.invalidate_user(db, conv.user_id)
+        counts[outcome] += 1
+    for o in orders:
+        outcome = outcome_of(o, cc_chain.owner_address)
+        if outcome is None:
+            continue
+        if outcome == "confirmed":
+            if _settle(db, order, order.tx_status, o.id, {"tx_status": "confirmed"}):
+                wallet = db.query(models.CompanyWallet).filter(models.CompanyWallet.company_id == o.company_id).first()
+                minted.append(("cct", wallet.wallet_address if wallet else None))
+                counts["confirmed"] += 1
+            continue
+        attempts = int(o.mint_attempts or 0) + (1 if outcome == "failed" else 0)
+        if attempts < settings.MINT_MAX_ATTEMPTS:
+            # The buyer has paid: mint their credits again
+            if _settle(db, order, order.tx_status, o.id, {**requeue, "tx_status": "queued", "mint_attempts": attempts}):
+                counts["requeued"] += 1
+            continue
+        if _settle(db, order, order.tx_status, o.id, {"tx_status": "failed", "mint_attempts": attempts}):
+            logging_service.log_event(db, "MINT_ORDER_FAILED", None, f"order {o.id} company {o.company_id} needs a refund after {attempts} failed mints")
+            counts["failed"] += 1
+    db.commit()
+    for token, address in minted:
+        balance_cache.invalidate(token, address)
+    return counts
+
+
+def _run():
+    while not _stop.wait(settings.CHAIN_RECEIPT_POLL_SECONDS):
+        db = SessionLocal()
+        try:
+            poll(db)
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+
+def start():
+    """
+    Starts the background receipt poller once per process. Does nothing
+    without an RPC endpoint or in demo mode, where mints confirm instantly.
+    """
+    global _thread
+    if not settings.CHAIN_RPC_URL or settings.ECO_TOKEN_DEMO_MODE:
+        return
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="receipt-tracker", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
@@ -0,0 +1,122 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from typing import Callable, Iterable
+import threading
+import time
+from .. import models
+from ..config import settings
+
+_PENDING_KEY = "response_cache_pending"
+
+_lock = threading.Lock()
+_entries: dict = {}
+_inflight: dict = {}
+_generations: dict = {}
+_stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0, "evictions": 0}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: BaseException | None = None
+
+
+def get_or_compute(user_id: int, key: str, compute: Callable):
+    """
+    Returns the cached response for (user_id, key) or runs compute() once,
+    with concurrent callers for the same key waiting on that single run.
+    Cached values are shared between requests and must not be mutated.
+    """
+    ttl = settings.DASHBOARD_CACHE_TTL_SECONDS
+    if ttl <= 0:
+        return compute()
+    cache_key = (user_id, key)
+    with _lock:
+        entry = _entries.get(cache_key)
+        if entry and entry[0] > time.monotonic():
+            _stats["hits"] += 1
+            return entry[1]
+        call = _inflight.get(cache_key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _inflight[cache_key] = call
+            generation = _generations.get(user_id, 0)
+            _stats["misses"] += 1
+        else:
+            _stats["coalesced"] += 1
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.value
+    try:
+        call.value = compute()
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(cache_key, None)
+            # Skip storing when a write committed while we were computing
+            if call.error is None and _generations.get(user_id, 0) == generation:
+                _entries.pop(cache_key, None)
+                _entries[cache_key] = (time.monotonic() + ttl, call.value)
+                while len(_entries) > settings.DASHBOARD_CACHE_MAX_ENTRIES:
+                    _entries.pop(next(iter(_entries)))
+                    _stats["evictions"] += 1
+        call.done.set()
+    return call.value
+
+
+def invalidate_user(db: Session, user_id: int):
+    """
+    Drops the user's cached responses once the caller's DB transaction
+    commits, so readers never re-cache pre-commit data.
+    """
+    db.info.setdefault(_PENDING_KEY, set()).add(user_id)
+
+
+def invalidate_vpas(db: Session, vpas: Iterable[str]):
+    rows = db.query(models.UpiAccount.user_id)\
+        .filter(models.UpiAccount.vpa.in_(list(vpas)), models.UpiAccount.user_id.isnot(None))\
+        .all()
+    for (user_id,) in rows:
+        invalidate_user(db, user_id)
+
+
+def _drop(user_ids: Iterable[int]):
+    with _lock:
+        for user_id in user_ids:
+            _generations[user_id] = _generations.get(user_id, 0) + 1
+            for cache_key in [k for k in _entries if k[0] == user_id]:
+                del _entries[cache_key]
+            _stats["invalidations"] += 1
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        _drop(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            **_stats,
+            "entries": len(_entries),
+            "max_entries": settings.DASHBOARD_CACHE_MAX_ENTRIES,
+            "ttl_seconds": settings.DASHBOARD_CACHE_TTL_SECONDS,
+        }
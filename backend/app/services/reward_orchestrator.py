@@ -0,0 +1,130 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from .. import models
+from . import eco_points, eco_score, user_level, badges, streaks, challenges, reward_rules, reward_state, carbon_totals, dashboard_snapshot, leaderboard, period_leaderboard
+
+MAX_CHALLENGE_ROUNDS = 10
+
+
+class RewardContext:
+    """
+    Collects every eco point award for one user within a unit of work.
+
+    The balance is loaded once and point deltas are accumulated in memory.
+    finish() then applies challenge, milestone, badge, score, level and streak
+    updates a single time instead of once per award. The caller commits.
+    """
+
+    def __init__(self, db: Session, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        self.balance = eco_points.ensure_balance(db, user_id, for_update=True)
+        self.points_awarded = 0
+        self.transactions = 0
+        self.saved_amount = 0.0
+        self.low_carbon = False
+        self.activity_at: datetime | None = None
+        self.saving_transaction_id: int | None = None
+        self._pending_points = 0
+        self._total_saved: float | None = None
+        self._reward_state: models.UserRewardState | None = None
+
+    @property
+    def total_saved(self) -> float:
+        if self._total_saved is None:
+            totals = carbon_totals.get_totals(self.db, self.user_id)
+            self._total_saved = float(totals.saved_kg or 0.0)
+        return self._total_saved
+
+    def award(self, points: int, action_type: str, description: str, transaction_id: int | None = None):
+        if points <= 0:
+            return None
+        self.balance.total_points = (self.balance.total_points or 0) + points
+        self.balance.lifetime_points = (self.balance.lifetime_points or 0) + points
+        self.db.add(self.balance)
+        leaderboard.record(self.db, self.user_id, self.balance.lifetime_points)
+        entry = models.EcoPointsTransaction(
+            user_id=self.user_id,
+            transaction_id=transaction_id,
+            points=points,
+            action_type=action_type,
+            description=description
+        )
+        self.db.add(entry)
+        self.points_awarded += points
+        self._pending_points += points
+        return entry
+
+    @property
+    def reward_state(self) -> models.UserRewardState:
+        if self._reward_state is None:
+            self._reward_state = reward_state.lock(self.db, self.user_id)
+        return self._reward_state
+
+    def daily_bonus_paid(self, day) -> bool:
+        last = self.reward_state.last_daily_bonus_on
+        return last is not None and last >= day
+
+    def mark_daily_bonus_paid(self, day):
+        state = self.reward_state
+        if state.last_daily_bonus_on is None or day > state.last_daily_bonus_on:
+            state.last_daily_bonus_on = day
+            self.db.add(state)
+
+    def milestone_paid(self, index: int) -> bool:
+        return bool((self.reward_state.milestones_paid or 0) & (1 << index))
+
+    def mark_milestone_paid(self, index: int):
+        state = self.reward_state
+        state.milestones_paid = (state.milestones_paid or 0) | (1 << index)
+        self.db.add(state)
+
+    def record_transaction(
+        self,
+        transaction_id: int,
+        saved_amount: float | None,
+        activity_at: datetime | None = None
+    ):
+        self.transactions += 1
+        self.activity_at = activity_at or datetime.now(timezone.utc)
+        saved = float(saved_amount or 0.0)
+        if saved > 0:
+            reward_rules.apply_transaction_rules(self, transaction_id, saved, self.activity_at)
+
+    def record_carbon(self, transaction_id: int, carbon_record: models.CarbonRecord):
+        saved = self.db.query(models.CarbonSaving.saved_amount)\
+            .filter(models.CarbonSaving.carbon_record_id == carbon_record.id)\
+            .scalar()
+        self.record_transaction(transaction_id, saved, carbon_record.created_at)
+
+    def finish(self):
+        db = self.db
+        if self.transactions:
+            challenges.update_on_transaction(db, self.user_id, self.transactions, award=self.award)
+        if self.saved_amount > 0:
+            challenges.update_on_saving(db, self.user_id, self.saved_amount, award=self.award)
+            reward_rules.apply_milestones(self, self.saving_transaction_id)
+        badge_metrics = {}
+        if self.transactions:
+            totals = carbon_totals.get_totals(db, self.user_id)
+            badge_metrics.update(badges.transaction_metrics(self.low_carbon, totals))
+        rounds = 0
+        while self._pending_points > 0 and rounds < MAX_CHALLENGE_ROUNDS:
+            pending = self._pending_points
+            self._pending_points = 0
+            db.flush()
+            challenges.update_on_points(db, self.user_id, pending, award=self.award)
+            rounds += 1
+        db.flush()
+        if self.points_awarded <= 0:
+            if badge_metrics:
+                badges.award_for_metrics(db, self.user_id, badge_metrics)
+            return
+        dashboard_snapshot.mark_stale(db, self.user_id)
+        period_leaderboard.add_points(db, self.user_id, self.points_awarded)
+        total = int(self.balance.total_points or 0)
+        eco_score.update_eco_score(db, self.user_id, points=total, saved=self.total_saved)
+        user_level.update_user_level(db, self.user_id, total_points=total)
+        badge_metrics["points"] = total
+        badges.award_for_metrics(db, self.user_id, badge_metrics)
+        streaks.update_on_activity(db, self.user_id)
@@ -1,38 +1,32 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from .. import models
-from . import eco_points, streaks, challenges
-from datetime import datetime, timezone
+from . import eco_points
+from datetime import datetime
 
-MILESTONES = [5, 10, 25, 50]
+MILESTONES = [5, 10, 25, 50] # Append only: the index is the bit in UserRewardState.milestones_paid
+LOW_CARBON_THRESHOLD = 0.1
+LOW_CARBON_BONUS = 50
+DAILY_BONUS = 20
+DAILY_BONUS_DESCRIPTION = "Daily eco activity"
+MILESTONE_BONUS = 500
 
-def apply_rules_for_transaction(db: Session, user_id: int, transaction_id: int, carbon_record_id: int):
-    saving = db.query(models.CarbonSaving).filter(models.CarbonSaving.carbon_record_id == carbon_record_id).first()
-    if not saving or saving.saved_amount is None or saving.saved_amount <= 0:
-        return
-    if saving.saved_amount >= 0.1:
-        eco_points.award_points(db, user_id, 50, "BONUS", "Low carbon transaction", transaction_id)
-    cr = db.query(models.CarbonRecord).filter(models.CarbonRecord.id == carbon_record_id).first()
-    if cr:
-        day = cr.created_at.date()
-        exists_daily = db.query(models.EcoPointsTransaction).filter(
-            models.EcoPointsTransaction.user_id == user_id,
-            models.EcoPointsTransaction.action_type == "BONUS",
-            models.EcoPointsTransaction.description == "Daily eco activity",
-            func.date(models.EcoPointsTransaction.created_at) == day
-        ).first()
-        if not exists_daily:
-            eco_points.award_points(db, user_id, 20, "BONUS", "Daily eco activity", transaction_id)
-            streaks.update_on_activity(db, user_id, cr.created_at)
-    if saving:
-        challenges.update_on_saving(db, user_id, float(saving.saved_amount or 0.0))
-    total_saved = db.query(func.sum(models.CarbonSaving.saved_amount)).filter(models.CarbonSaving.user_id == user_id).scalar() or 0.0
-    for m in MILESTONES:
-        if total_saved >= m:
-            exists_m = db.query(models.EcoPointsTransaction).filter(
-                models.EcoPointsTransaction.user_id == user_id,
-                models.EcoPointsTransaction.action_type == "BONUS",
-                models.EcoPointsTransaction.description == f"MILESTONE:{m}"
-            ).first()
-            if not exists_m:
-                eco_points.award_points(db, user_id, 500, "BONUS", f"MILESTONE:{m}", transaction_id)
+def apply_transaction_rules(ctx, transaction_id: int, saved_amount: float, activity_at: datetime):
+    """
+    Awards the per-transaction rewards for a carbon saving into a RewardContext.
+    """
+    points = int(round(saved_amount * eco_points.DEFAULT_MULTIPLIER))
+    ctx.award(points, "TRANSACTION_REWARD", "Eco points awarded for carbon savings", transaction_id)
+    if saved_amount >= LOW_CARBON_THRESHOLD:
+        ctx.award(LOW_CARBON_BONUS, "BONUS", "Low carbon transaction", transaction_id)
+        ctx.low_carbon = True
+    day = activity_at.date()
+    if not ctx.daily_bonus_paid(day):
+        ctx.award(DAILY_BONUS, "BONUS", DAILY_BONUS_DESCRIPTION, transaction_id)
+        ctx.mark_daily_bonus_paid(day)
+    ctx.saved_amount += saved_amount
+    ctx.saving_transaction_id = transaction_id
+
+def apply_milestones(ctx, transaction_id: int | None):
+    total_saved = ctx.total_saved
+    for i, m in enumerate(MILESTONES):
+        if total_saved >= m and not ctx.milestone_paid(i):
+            ctx.award(MILESTONE_BONUS, "BONUS", f"MILESTONE:{m}", transaction_id)
+            ctx.mark_milestone_paid(i)
@@ -0,0 +1,55 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from .. import models
+from ..database import dialect_insert
+from . import reward_rules
+
+
+def _backfill(db: Session, user_id: int):
+    """
+    Builds the state row from the user's bonus history. Only runs for users
+    whose row does not exist yet.
+    """
+    bonus = models.EcoPointsTransaction
+    last = db.execute(
+        select(func.max(bonus.created_at)).where(
+            bonus.user_id == user_id,
+            bonus.action_type == "BONUS",
+            bonus.description == reward_rules.DAILY_BONUS_DESCRIPTION
+        )
+    ).scalar()
+    paid = {
+        d for (d,) in db.execute(
+            select(bonus.description).where(
+                bonus.user_id == user_id,
+                bonus.action_type == "BONUS",
+                bonus.description.in_([f"MILESTONE:{m}" for m in reward_rules.MILESTONES])
+            )
+        ).all()
+    }
+    mask = 0
+    for i, m in enumerate(reward_rules.MILESTONES):
+        if f"MILESTONE:{m}" in paid:
+            mask |= 1 << i
+    stmt = dialect_insert(db, models.UserRewardState).values(
+        user_id=user_id,
+        last_daily_bonus_on=last.date() if last else None,
+        milestones_paid=mask,
+    ).on_conflict_do_nothing(index_elements=["user_id"])
+    db.execute(stmt)
+
+
+def lock(db: Session, user_id: int) -> models.UserRewardState:
+    """
+    Loads the user's reward state row FOR UPDATE, creating it on first use.
+    Hold it for the rest of the DB transaction so concurrent payments cannot
+    both pay the same daily bonus or milestone.
+    """
+    query = db.query(models.UserRewardState)\
+        .filter(models.UserRewardState.user_id == user_id)\
+        .with_for_update()
+    state = query.first()
+    if not state:
+        _backfill(db, user_id)
+        state = query.populate_existing().first()
+    return state
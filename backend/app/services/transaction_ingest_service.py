@@ -0,0 +1,129 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from collections import defaultdict
+from datetime import datetime, timezone
+from .. import models
+from . import emission_factors, reward_orchestrator, carbon_totals, carbon_rollups
+
+DEFAULT_FACTOR = 0.0003
+
+
+def _resolve_factor(db: Session, category: str):
+    factor = emission_factors.resolve(db, category)
+    if not factor:
+        return DEFAULT_FACTOR, None
+    return factor.co2_per_unit, factor.baseline_co2_per_unit
+
+
+def ingest_transactions(db: Session, entries: list[dict]) -> dict:
+    """
+    Records a batch of completed transactions with their carbon records, savings
+    and rewards using multi-row inserts.
+
+    Each entry is a dict with user_id, amount (paisa), currency, type, category
+    and description. Points, badges, challenges and streaks are applied once per
+    affected user rather than once per transaction. The caller commits.
+    """
+    if not entries:
+        return {"created": 0, "transaction_ids": [], "points_awarded": 0}
+    now = datetime.now(timezone.utc)
+
+    tx_ids = list(db.scalars(
+        insert(models.Transaction).returning(models.Transaction.id, sort_by_parameter_order=True),
+        [
+            {
+                "user_id": e["user_id"],
+                "amount": e["amount"],
+                "currency": e.get("currency") or "INR",
+                "type": e["type"],
+                "category": e["category"],
+                "description": e.get("description"),
+                "status": "completed",
+                "payment_id": None,
+                "created_at": now,
+            }
+            for e in entries
+        ],
+    ))
+
+    record_rows = []
+    for e, tx_id in zip(entries, tx_ids):
+        co2_per_unit, baseline = _resolve_factor(db, e["category"])
+        amount_inr = e["amount"] / 100.0
+        emission = amount_inr * co2_per_unit
+        saved = amount_inr * baseline - emission if baseline else 0.0
+        record_rows.append({
+            "user_id": e["user_id"],
+            "transaction_id": tx_id,
+            "category": e["category"],
+            "amount": e["amount"],
+            "emission_factor": co2_per_unit,
+            "carbon_emission": emission,
+            "created_at": now,
+            "_saved": saved,
+        })
+    record_ids = list(db.scalars(
+        insert(models.CarbonRecord).returning(models.CarbonRecord.id, sort_by_parameter_order=True),
+        [{k: v for k, v in r.items() if k != "_saved"} for r in record_rows],
+    ))
+
+    saving_rows = []
+    saved_by_tx = {}
+    for r, record_id in zip(record_rows, record_ids):
+        if r["_saved"] > 0:
+            saving_rows.append({
+                "user_id": r["user_id"],
+                "carbon_record_id": record_id,
+                "saved_amount": r["_saved"],
+                "created_at": now,
+            })
+            saved_by_tx[r["transaction_id"]] = r["_saved"]
+    if saving_rows:
+        db.execute(insert(models.CarbonSaving), saving_rows)
+
+    tx_ids_by_user = defaultdict(list)
+    for e, tx_id in zip(entries, tx_ids):
+        tx_ids_by_user[e["user_id"]].append(tx_id)
+    emitted_by_user = defaultdict(float)
+    for r in record_rows:
+        emitted_by_user[r["user_id"]] += r["carbon_emission"]
+    saved_by_user = defaultdict(float)
+    for s in saving_rows:
+        saved_by_user[s["user_id"]] += s["saved_amount"]
+    spent_by_user = defaultdict(int)
+    for e in entries:
+        if e["type"] == "debit":
+            spent_by_user[e["user_id"]] += e["amount"]
+    for user_id, user_tx_ids in tx_ids_by_user.items():
+        carbon_totals.apply_delta(
+            db,
+            user_id,
+            saved=saved_by_user[user_id],
+            emitted=emitted_by_user[user_id],
+            transactions=len(user_tx_ids),
+            activity_at=now,
+            spent=spent_by_user[user_id]
+        )
+
+    carbon_rollups.add(db, [
+        {
+            "user_id": r["user_id"],
+            "category": r["category"],
+            "at": now,
+            "emitted": r["carbon_emission"],
+            "saved": r["_saved"] if r["_saved"] > 0 else 0.0,
+            "spent": r["amount"],
+            "count": 1,
+        }
+        for r in record_rows
+    ])
+
+    points_awarded = 0
+    for user_id, user_tx_ids in tx_ids_by_user.items():
+        rewards = reward_orchestrator.RewardContext(db, user_id)
+        for tx_id in user_tx_ids:
+            rewards.record_transaction(tx_id, saved_by_tx.get(tx_id), now)
+        rewards.finish()
+        points_awarded += rewards.points_awarded
+    db.flush()
+    return {"created": len(tx_ids), "transaction_ids": tx_ids, "points_awarded": points_awarded}
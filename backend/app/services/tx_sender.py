@@ -0,0 +1,63 @@
+import threading
+from eth_account import Account
+
+_registry_lock = threading.Lock()
+_accounts: dict = {}
+
+
+class _NonceState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_nonce: int | None = None
+
+
+def _state(address: str) -> _NonceState:
+    state = _accounts.get(address)
+    if state is None:
+        with _registry_lock:
+            state = _accounts.setdefault(address, _NonceState())
+    return state
+
+
+def reset(address: str | None = None):
+    """
+    Forgets allocated nonces so the next send re-reads the pending count from
+    the node. Call after transactions were sent from the key elsewhere.
+    """
+    with _registry_lock:
+        if address is None:
+            _accounts.clear()
+        else:
+            _accounts.pop(address, None)
+
+
+def send(w3, private_key: str, call, params: dict, on_signed=None) -> str:
+    """
+    Signs and broadcasts a contract call without waiting for its receipt.
+
+    Nonces come from a per-account local counter seeded from the node's
+    pending transaction count, so concurrent sends from one key never reuse a
+    nonce. Only allocation, signing and the broadcast hold the account lock;
+    gas estimates belong in `params`, computed before calling. A failed
+    broadcast drops the counter so the next send resyncs from the node.
+    `on_signed(tx_hash, nonce)` runs after signing and before the broadcast
+    so callers can persist the hash first; if it raises, nothing is sent.
+    Returns the transaction hash.
+    """
+    acct = Account.from_key(private_key)
+    state = _state(acct.address)
+    with state.lock:
+        if state.next_nonce is None:
+            state.next_nonce = w3.eth.get_transaction_count(acct.address, "pending")
+        nonce = state.next_nonce
+        tx = call.build_transaction({**params, "from": acct.address, "nonce": nonce})
+        signed = acct.sign_transaction(tx)
+        if on_signed:
+            on_signed(w3.to_hex(signed.hash), nonce)
+        try:
+            tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
+        except Exception:
+            state.next_nonce = None
+            raise
+        state.next_nonce = nonce + 1
+    return w3.to_hex(tx_hash)
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from .. import models
+from . import response_cache
 import uuid
 
 UPI_SUFFIX = "ecopay"
@@ -207,6 +208,7 @@ def complete_transaction(
         raise ValueError("UPI transaction not found")
     rec.status = "SUCCESS"
     rec.completed_at = completed_at
+    response_cache.invalidate_vpas(db, [rec.sender_upi_id, rec.receiver_upi_id])
     db.flush()
     db.refresh(rec)
     return rec
@@ -16,9 +16,11 @@ def determine_level(total_points: int):
             return name, required
     return "Beginner", 0
 
-def update_user_level(db: Session, user_id: int):
-    bal = db.query(models.EcoPointsBalance).filter(models.EcoPointsBalance.user_id == user_id).first()
-    total = bal.total_points if bal else 0
+def update_user_level(db: Session, user_id: int, total_points: int | None = None):
+    total = total_points
+    if total is None:
+        bal = db.query(models.EcoPointsBalance).filter(models.EcoPointsBalance.user_id == user_id).first()
+        total = bal.total_points if bal else 0
     level_name, required = determine_level(total)
     record = db.query(models.EcoUserLevel).filter(models.EcoUserLevel.user_id == user_id).first()
     now = datetime.now(timezone.utc)
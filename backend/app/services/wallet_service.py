@@ -1,7 +1,7 @@
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 from .. import models
-from . import upi_service
+from . import upi_service, response_cache
 
 
 def create_wallet(db: Session, owner_type: str, owner_id: int, upi_id: str | None = None) -> models.Wallet:
@@ -54,6 +54,7 @@ def update_balance(db: Session, upi_id: str, delta_amount: int) -> models.Wallet
     if new_balance < 0:
         raise ValueError("Insufficient balance")
     wallet.balance = new_balance
+    response_cache.invalidate_vpas(db, [upi_id])
     db.flush()
     db.refresh(wallet)
     return wallet
@@ -0,0 +1,178 @@
+"""
+Benchmarks the hot per-user queries with and without the composite index pack
+(app/schema_upgrades.py KEYSET_INDEXES + HOT_PATH_INDEXES).
+
+Seeds a synthetic dataset into a throwaway database, then prints the query
+plan and median latency of each query before and after the indexes exist.
+
+    python benchmark_indexes.py                         # SQLite file in /tmp
+    python benchmark_indexes.py --users 500 --per-user 400
+    BENCH_DATABASE_URL=postgresql://... python benchmark_indexes.py
+
+Only point BENCH_DATABASE_URL at a scratch database: all tables are dropped
+and recreated.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DATABASE_URL = os.environ.get("BENCH_DATABASE_URL", "sqlite:////tmp/greenzaction_bench.db")
+# The app settings require a DATABASE_URL; the benchmark itself only ever
+# connects to BENCH_DATABASE_URL
+os.environ.setdefault("DATABASE_URL", BENCH_DATABASE_URL)
+
+from sqlalchemy import create_engine, func, insert, select, text
+from app import models
+from app.schema_upgrades import KEYSET_INDEXES, HOT_PATH_INDEXES
+from app.services import reward_rules
+
+CATEGORIES = ["Food", "Transport", "Shopping", "Utilities", "Other"]
+PACK = KEYSET_INDEXES + HOT_PATH_INDEXES
+
+
+def seed(engine, users: int, per_user: int, rng: random.Random):
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": u, "email": f"bench{u}@example.com", "full_name": f"Bench {u}", "is_active": True}
+            for u in range(1, users + 1)
+        ])
+        tx_rows, record_rows, saving_rows, point_rows = [], [], [], []
+        next_id = 1
+        for u in range(1, users + 1):
+            for _ in range(per_user):
+                at = start + timedelta(seconds=rng.randint(0, 365 * 86400))
+                amount = rng.randint(100, 500000)
+                tx_rows.append({
+                    "id": next_id, "user_id": u, "amount": amount, "currency": "INR",
+                    "type": "debit" if rng.random() < 0.9 else "credit",
+                    "category": rng.choice(CATEGORIES), "status": "completed", "created_at": at,
+                })
+                record_rows.append({
+                    "id": next_id, "user_id": u, "transaction_id": next_id, "category": tx_rows[-1]["category"],
+                    "amount": amount, "emission_factor": 0.0003, "carbon_emission": amount / 100.0 * 0.0003,
+                    "created_at": at,
+                })
+                saving_rows.append({
+                    "user_id": u, "carbon_record_id": next_id, "saved_amount": rng.random(), "created_at": at,
+                })
+                point_rows.append({
+                    "user_id": u, "transaction_id": next_id, "points": rng.randint(1, 100),
+                    "action_type": rng.choice(["TRANSACTION_REWARD", "BONUS"]),
+                    "description": rng.choice([reward_rules.DAILY_BONUS_DESCRIPTION, "Low carbon transaction", "MILESTONE:5"]),
+                    "created_at": at,
+                })
+                next_id += 1
+        for model, rows in (
+            (models.Transaction, tx_rows),
+            (models.CarbonRecord, record_rows),
+            (models.CarbonSaving, saving_rows),
+            (models.EcoPointsTransaction, point_rows),
+        ):
+            for i in range(0, len(rows), 5000):
+                conn.execute(insert(model), rows[i:i + 5000])
+    return next_id - 1
+
+
+def queries(user_id: int, record_id: int):
+    day = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    return [
+        ("recent transactions", select(models.Transaction)
+            .where(models.Transaction.user_id == user_id)
+            .order_by(models.Transaction.created_at.desc(), models.Transaction.id.desc()).limit(20)),
+        ("total spent", select(func.sum(models.Transaction.amount))
+            .where(models.Transaction.user_id == user_id, models.Transaction.type == "debit",
+                   models.Transaction.status == "completed")),
+        ("carbon history", select(models.CarbonRecord)
+            .where(models.CarbonRecord.user_id == user_id)
+            .order_by(models.CarbonRecord.created_at.desc(), models.CarbonRecord.id.desc()).limit(20)),
+        ("saving by record", select(models.CarbonSaving.saved_amount)
+            .where(models.CarbonSaving.carbon_record_id == record_id)),
+        ("saving history", select(models.CarbonSaving)
+            .where(models.CarbonSaving.user_id == user_id)
+            .order_by(models.CarbonSaving.created_at.desc(), models.CarbonSaving.id.desc()).limit(20)),
+        ("daily bonus check", select(models.EcoPointsTransaction.id)
+            .where(models.EcoPointsTransaction.user_id == user_id,
+                   models.EcoPointsTransaction.action_type == "BONUS",
+                   models.EcoPointsTransaction.description == reward_rules.DAILY_BONUS_DESCRIPTION,
+                   models.EcoPointsTransaction.created_at >= day).limit(1)),
+        ("points history", select(models.EcoPointsTransaction)
+            .where(models.EcoPointsTransaction.user_id == user_id)
+            .order_by(models.EcoPointsTransaction.created_at.desc(), models.EcoPointsTransaction.id.desc()).limit(20)),
+    ]
+
+
+def explain(conn, stmt) -> str:
+    compiled = stmt.compile(dialect=conn.dialect)
+    if conn.dialect.name == "sqlite":
+        params = tuple(compiled.params[k] for k in compiled.positiontup)
+        params = tuple(p.strftime("%Y-%m-%d %H:%M:%S.%f") if isinstance(p, datetime) else p for p in params)
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, params).all()
+        return "; ".join(r[-1] for r in rows)
+    rows = conn.exec_driver_sql("EXPLAIN ANALYZE " + compiled.string, compiled.params).all()
+    return "\n      ".join(r[0] for r in rows)
+
+
+def measure(engine, users: int, records: int, repeat: int, rng: random.Random) -> dict:
+    results = {}
+    with engine.connect() as conn:
+        sample = [(rng.randint(1, users), rng.randint(1, records)) for _ in range(repeat)]
+        for idx, (name, _) in enumerate(queries(1, 1)):
+            timings = []
+            for user_id, record_id in sample:
+                stmt = queries(user_id, record_id)[idx][1]
+                t0 = time.perf_counter()
+                conn.execute(stmt).all()
+                timings.append((time.perf_counter() - t0) * 1000)
+            results[name] = (statistics.median(timings), explain(conn, queries(*sample[0])[idx][1]))
+    return results
+
+
+def set_pack(engine, present: bool):
+    with engine.begin() as conn:
+        for model, name in PACK:
+            index = next(i for i in model.__table__.indexes if i.name == name)
+            if present:
+                index.create(conn, checkfirst=True)
+            else:
+                index.drop(conn, checkfirst=True)
+        conn.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--per-user", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(BENCH_DATABASE_URL)
+    print(f"database: {engine.url.render_as_string(hide_password=True)}")
+    t0 = time.perf_counter()
+    records = seed(engine, args.users, args.per_user, random.Random(args.seed))
+    print(f"seeded {args.users} users x {args.per_user} transactions in {time.perf_counter() - t0:.1f}s")
+
+    set_pack(engine, False)
+    before = measure(engine, args.users, records, args.repeat, random.Random(args.seed))
+    set_pack(engine, True)
+    after = measure(engine, args.users, records, args.repeat, random.Random(args.seed))
+
+    print(f"\n{'query':<20} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in before:
+        b, a = before[name][0], after[name][0]
+        print(f"{name:<20} {b:>10.3f} {a:>10.3f} {b / a if a else float('inf'):>7.1f}x")
+    print("\nplans")
+    for name in before:
+        print(f"  {name}\n    before: {before[name][1]}\n    after:  {after[name][1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,4 +10,11 @@ contract EcoToken is ERC20, Ownable {
     function mint(address to, uint256 amount) external onlyOwner {
         _mint(to, amount);
     }
+
+    function mintBatch(address[] calldata to, uint256[] calldata amounts) external onlyOwner {
+        require(to.length == amounts.length, "length mismatch");
+        for (uint256 i = 0; i < to.length; i++) {
+            _mint(to[i], amounts[i]);
+        }
+    }
 }